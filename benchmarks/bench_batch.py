@@ -0,0 +1,62 @@
+"""
+Batch experiment runner vs looping over calculate_metrics_from_counts
+
+Generates N random two-arm experiments, evaluates them both ways, checks that
+the results agree and reports the speedup.
+
+    python benchmarks/bench_batch.py [--experiments 1000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'streamlit_app', 'utils'))
+
+from batch import batch_metrics  # noqa: E402
+from calculations import calculate_metrics_from_counts  # noqa: E402
+
+SCALAR_KEYS = ['abs_diff', 'lift', 'z_stat', 'p_value', 'lift_ci_lower', 'lift_ci_upper',
+               'cohens_h', 'chi2', 'chi2_p']
+
+
+def random_experiments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ad_total = rng.integers(5_000, 500_000, n)
+    psa_total = rng.integers(1_000, 50_000, n)
+    base = rng.uniform(0.01, 0.05, n)
+    ad_conversions = rng.binomial(ad_total, base * rng.uniform(0.9, 1.5, n))
+    psa_conversions = rng.binomial(psa_total, base)
+    return ad_conversions, ad_total, psa_conversions, psa_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--experiments', type=int, default=1000)
+    args = parser.parse_args()
+
+    counts = random_experiments(args.experiments)
+
+    start = time.perf_counter()
+    looped = [calculate_metrics_from_counts(*row) for row in zip(*counts)]
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = batch_metrics(*counts)
+    batch_seconds = time.perf_counter() - start
+
+    for key in SCALAR_KEYS:
+        expected = np.array([m[key] for m in looped])
+        np.testing.assert_allclose(batched[key], expected, rtol=1e-9, err_msg=key)
+
+    print(f'{args.experiments:,} experiments')
+    print(f'loop over calculate_metrics_from_counts: {loop_seconds:.3f}s')
+    print(f'batch_metrics:                           {batch_seconds:.4f}s')
+    print(f'speedup:                                 {loop_seconds / batch_seconds:,.0f}x')
+
+
+if __name__ == '__main__':
+    main()
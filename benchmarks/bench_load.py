@@ -0,0 +1,78 @@
+"""
+Cold-load benchmark: CSV parse vs columnar snapshot
+
+Each loader runs in a fresh interpreter so the timings include no warm
+caches and peak RSS is measured per path.
+
+    python benchmarks/bench_load.py [--data Data/marketing_AB.csv] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UTILS_DIR = os.path.join(ROOT, 'streamlit_app', 'utils')
+
+# Snippets executed in a child process; each prints a JSON result line
+_LOADERS = {
+    'read_csv(index_col=0)': (
+        "import pandas as pd\n"
+        "frame = pd.read_csv(PATH, index_col=0)\n"
+    ),
+    'typed csv': (
+        "from data_store import read_csv_typed\n"
+        "frame = read_csv_typed(PATH)\n"
+    ),
+    'snapshot': (
+        "from snapshot import read_snapshot, snapshot_dir\n"
+        "frame = read_snapshot(snapshot_dir(PATH))\n"
+        "assert frame is not None, 'snapshot missing'\n"
+    ),
+}
+
+_CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, {utils_dir!r})
+PATH = {path!r}
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'frame_mb': frame.memory_usage(deep=True).sum() / 1024 ** 2,
+    'rows': len(frame),
+}}))
+"""
+
+
+def run_child(body, path):
+    code = _CHILD.format(utils_dir=UTILS_DIR, path=path, body=body)
+    out = subprocess.run([sys.executable, '-c', code], check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--data', default=os.path.join(ROOT, 'Data', 'marketing_AB.csv'))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Make sure a current snapshot exists before timing it. This runs in a
+    # child too: ru_maxrss survives exec, so the parent must stay small.
+    path = os.path.abspath(args.data)
+    run_child("from data_store import get_dataset\nframe = get_dataset(PATH)\n", path)
+
+    print(f"{'loader':<24}{'best s':>10}{'peak RSS MB':>14}{'frame MB':>11}")
+    for name, body in _LOADERS.items():
+        runs = [run_child(body, path) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r['seconds'])
+        peak = max(r['peak_rss_mb'] for r in runs)
+        print(f"{name:<24}{best['seconds']:>10.3f}{peak:>14.1f}{best['frame_mb']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
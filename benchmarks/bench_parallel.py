@@ -0,0 +1,70 @@
+"""
+Scaling benchmark for parallel shard aggregation
+
+Splits a CSV into shards (unless --shards is given) and times
+``aggregate_shards`` with 1, 2, 4, ... workers up to the CPU count.
+
+    python benchmarks/bench_parallel.py [--data Data/marketing_AB.csv] [--shards 'exports/*.csv']
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'streamlit_app', 'utils'))
+
+from parallel import aggregate_shards, expand_shards  # noqa: E402
+
+
+def split_csv(path, out_dir, shards):
+    """Write ``path`` as ``shards`` CSV files with the same header"""
+    with open(path) as f:
+        header = f.readline()
+        lines = f.readlines()
+    per_shard = -(-len(lines) // shards)
+    paths = []
+    for i in range(shards):
+        part = lines[i * per_shard:(i + 1) * per_shard]
+        if not part:
+            break
+        shard_path = os.path.join(out_dir, f'shard_{i:03d}.csv')
+        with open(shard_path, 'w') as f:
+            f.write(header)
+            f.writelines(part)
+        paths.append(shard_path)
+    return paths
+
+
+def worker_counts(limit):
+    counts, n = [], 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    return counts + [limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--data', default=os.path.join(ROOT, 'Data', 'marketing_AB.csv'))
+    parser.add_argument('--shards', help='directory or glob of existing shards')
+    parser.add_argument('--num-shards', type=int, default=16)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = expand_shards(args.shards) if args.shards else split_csv(args.data, tmp, args.num_shards)
+        print(f'{len(paths)} shards, up to {args.max_workers} workers')
+        print(f"{'workers':>8}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}{'efficiency':>12}")
+
+        baseline = None
+        for workers in worker_counts(min(args.max_workers, len(paths))):
+            _, stats = aggregate_shards(paths, workers=workers)
+            baseline = baseline or stats['seconds']
+            speedup = baseline / stats['seconds']
+            print(f"{workers:>8}{stats['seconds']:>10.3f}{stats['rows_per_sec']:>14,.0f}"
+                  f"{speedup:>10.2f}{speedup / workers:>12.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Power calculator: normal approximation vs exact binomial power
+
+Draws random (baseline, MDE, sample size, allocation) designs, computes the
+power of each with the closed-form approximation used by the sliders and
+with ``exact_power``, and reports per-query latency and the absolute error of
+the approximation.
+
+    python benchmarks/bench_power.py [--queries 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'streamlit_app', 'utils'))
+
+import power  # noqa: E402
+
+
+def random_designs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return list(zip(
+        np.exp(rng.uniform(np.log(0.005), np.log(0.2), n)),
+        np.exp(rng.uniform(np.log(0.05), np.log(0.8), n)),
+        np.exp(rng.uniform(np.log(1_000), np.log(1_000_000), n)).round(),
+        rng.uniform(0.05, 0.95, n),
+    ))
+
+
+def timed(func, designs):
+    start = time.perf_counter()
+    values = np.array([func(*design) for design in designs])
+    return values, (time.perf_counter() - start) / len(designs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    designs = random_designs(args.queries)
+
+    approx, approx_seconds = timed(power.power_at, designs)
+    exact, exact_seconds = timed(power.exact_power, designs)
+    _, size_seconds = timed(lambda b, m, n, a: power.required_sample_size(b, m, a), designs)
+    _, mde_seconds = timed(lambda b, m, n, a: power.minimum_detectable_effect(b, n, a), designs)
+
+    start = time.perf_counter()
+    power.required_sample_size(0.02, np.geomspace(0.01, 1, 200)[:, None], np.linspace(0.05, 0.95, 200))
+    surface_seconds = time.perf_counter() - start
+
+    print(f'{args.queries} designs')
+    print(f'power, normal approximation   {approx_seconds * 1e6:10.1f} us/query')
+    print(f'power, exact binomial         {exact_seconds * 1e6:10.1f} us/query')
+    print(f'required sample size          {size_seconds * 1e6:10.1f} us/query')
+    print(f'minimum detectable effect     {mde_seconds * 1e6:10.1f} us/query')
+    print(f'200 x 200 sample-size surface {surface_seconds * 1e3:10.2f} ms')
+
+    error = np.abs(approx - exact)
+    print(f'approximation error (power): median {np.median(error):.4f}, '
+          f'p99 {np.quantile(error, 0.99):.4f}, max {error.max():.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Load test for the metrics service (serve.py)
+
+Keeps ``--concurrency`` keep-alive connections busy until ``--requests``
+responses arrive, cycling through every endpoint of every experiment (or the
+given ``--path``s). Reports requests/sec, latency percentiles, status counts
+and what the server's aggregate cache did meanwhile: builds, hits and
+requests coalesced onto a build in flight.
+
+    python benchmarks/bench_service.py [--url http://127.0.0.1:8765] [--requests 20000]
+        [--concurrency 64] [--path /experiments/marketing_AB/metrics ...] [--json]
+    python benchmarks/bench_service.py --serve Data/marketing_AB.csv [more.csv ...]
+
+``--serve`` starts serve.py on a free port for the run, so the first requests
+hit a cold cache.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _request(reader, writer, host, path):
+    """One GET on an open connection; returns ``(status, body)``"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        field, _, value = line.decode('latin-1').partition(':')
+        if field.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _get_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await _request(reader, writer, host, path)
+    finally:
+        writer.close()
+    if status != 200:
+        raise RuntimeError(f'GET {path} returned {status}: {body.decode()}')
+    return json.loads(body)
+
+
+async def _worker(host, port, paths, counter, total, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < total:
+            path = paths[counter[0] % len(paths)]
+            counter[0] += 1
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, path)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def load_test(url, requests, concurrency, paths=None):
+    """Run the load test against the service at ``url`` and return the results"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    if not paths:
+        paths = [path for experiment in await _get_json(host, port, '/experiments')
+                 for path in experiment['endpoints']]
+    before = (await _get_json(host, port, '/stats'))['cache']
+
+    latencies, statuses, counter = [], {}, [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker(host, port, paths, counter, requests, latencies, statuses)
+                           for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+
+    after = (await _get_json(host, port, '/stats'))['cache']
+    ms = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'paths': len(paths),
+        'seconds': elapsed,
+        'rps': len(latencies) / elapsed,
+        'latency_ms': {
+            'mean': float(ms.mean()),
+            **{f'p{q}': float(np.percentile(ms, q)) for q in (50, 90, 95, 99)},
+            'max': float(ms.max()),
+        },
+        'statuses': statuses,
+        'cache': {key: after[key] - before[key]
+                  for key in ('hits', 'misses', 'coalesced', 'builds', 'build_errors', 'build_time')},
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(inputs):
+    """Start serve.py on a free port and wait until it answers"""
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), *inputs, '--port', str(port)],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'serve.py exited with status {process.returncode}')
+        try:
+            asyncio.run(_get_json('127.0.0.1', port, '/healthz'))
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('serve.py did not start within 60s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--path', action='append', dest='paths', help='endpoint to request (repeatable)')
+    parser.add_argument('--serve', nargs='+', metavar='INPUT', help='start serve.py on these inputs for the run')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    process, url = _start_server(args.serve) if args.serve else (None, args.url)
+    try:
+        result = asyncio.run(load_test(url, args.requests, args.concurrency, args.paths))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    latency, cache = result['latency_ms'], result['cache']
+    print(f"{result['requests']:,} requests over {result['paths']} paths, {result['concurrency']} connections, "
+          f"{result['seconds']:.2f}s")
+    print(f"throughput  {result['rps']:,.0f} req/s")
+    print('latency ms  ' + '  '.join(f'{key} {value:.2f}' for key, value in latency.items()))
+    print('statuses    ' + '  '.join(f'{status}: {count:,}' for status, count in sorted(result['statuses'].items())))
+    print(f"cache       {cache['builds']} builds ({cache['build_time']:.2f}s), {cache['hits']:,} hits, "
+          f"{cache['coalesced']:,} coalesced, {cache['build_errors']} build errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Cold-start import profile of the Streamlit entry points
+
+Each script's import header (every top-level statement up to its last
+import) runs in a fresh ``python -X importtime`` interpreter. The report
+shows the header's wall time and the heaviest top-level packages it pulled
+in. ``streamlit`` itself is imported before the clock starts because every
+page pays for it regardless of what it uses.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--json out.json] [--baseline before.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, 'streamlit_app')
+SCRIPTS = ['Home.py'] + sorted(
+    os.path.join('pages', name) for name in os.listdir(os.path.join(APP_DIR, 'pages')) if name.endswith('.py')
+)
+
+# Packages listed in the per-script breakdown when they were imported
+HEAVY = ('pandas', 'numpy', 'scipy', 'statsmodels', 'plotly', 'pyarrow')
+
+_CHILD = """
+import ast, json, sys, time
+import streamlit
+path = {path!r}
+with open(path) as f:
+    body = ast.parse(f.read()).body
+last = max(i for i, node in enumerate(body) if isinstance(node, (ast.Import, ast.ImportFrom)))
+header = compile(ast.Module(body=body[:last + 1], type_ignores=[]), path, 'exec')
+before = set(sys.modules)
+start = time.perf_counter()
+exec(header, {{'__file__': path, '__name__': '__page__'}})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(set(sys.modules) - before)}}))
+"""
+
+_IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def profile(script):
+    """Header wall time, number of newly imported modules and cumulative time per heavy package"""
+    path = os.path.join(APP_DIR, script)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD.format(path=path)],
+                          check=True, capture_output=True, text=True, cwd=ROOT)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # Each module is reported once, where it is first imported. A package's
+    # cost is its most expensive submodule import (e.g. scipy.stats rather
+    # than the nearly empty scipy/__init__), which includes its whole subtree.
+    packages = {}
+    for match in _IMPORTTIME.finditer(proc.stderr):
+        _, cumulative, _, name = match.groups()
+        package = name.split('.')[0]
+        if package in HEAVY and name in result['modules']:
+            packages[package] = max(packages.get(package, 0), int(cumulative) / 1e6)
+    return {'seconds': result['seconds'], 'modules': len(result['modules']), 'packages': packages}
+
+
+def run(repeat):
+    results = {}
+    for script in SCRIPTS:
+        runs = [profile(script) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['seconds'])
+        results[script] = best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='results file from an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    header = f"{'script':<28}{'import s':>10}{'modules':>9}"
+    if baseline:
+        header += f"{'before s':>10}{'speedup':>9}"
+    print(header + '  heavy packages (s)')
+    for script, result in results.items():
+        line = f"{script:<28}{result['seconds']:>10.3f}{result['modules']:>9}"
+        if script in baseline:
+            before = baseline[script]['seconds']
+            line += f"{before:>10.3f}{before / result['seconds']:>8.1f}x"
+        elif baseline:
+            line += f"{'-':>10}{'-':>9}"
+        heavy = ', '.join(f"{name} {result['packages'][name]:.2f}" for name in HEAVY
+                          if name in result['packages'])
+        print(f"{line}  {heavy or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
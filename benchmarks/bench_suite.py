@@ -0,0 +1,255 @@
+"""
+Regression benchmark suite for the load, aggregate, test and render paths
+
+For each dataset size a seeded synthetic CSV is generated (and reused on
+later runs). Each case's best-of-N wall time and its peak traced allocation
+(one extra run under ``tracemalloc``) are recorded:
+
+- load:     CSV parse with the schema, and ``load_data`` from its snapshot
+- metrics:  ``calculate_metrics`` with its cache cleared
+- analysis: every groupby / ``pd.cut`` block the 3_Analysis page used to run on
+            rows, next to the ``SegmentCube`` build and the cube queries that
+            replaced them
+- tests:    the chi-square test on a ``pd.crosstab`` of arm vs conversion
+- pages:    a cold run of pages 2-5 (caches cleared) plus the build time and
+            payload of every figure on them, read from ``figure_stats``
+
+Results go to a JSON file. With ``--baseline`` each case is compared against
+an earlier results file, and the exit status is 1 when any case got slower
+(or used more memory) than ``--threshold`` times its baseline.
+
+    python benchmarks/bench_suite.py [--sizes 1e5,1e6,1e7] [--repeat 3] [--out results.json]
+        [--baseline benchmarks/baseline.json] [--threshold 1.25] [--skip csv_parse,pages]
+
+1e8 rows is supported, but the CSV parse holds several GB; skip ``load.csv_parse``
+on machines with less memory.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'streamlit_app', 'utils'))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from scipy import stats  # noqa: E402
+
+import calculations  # noqa: E402
+import data_store  # noqa: E402
+from cube import DOSE_BINS, DOSE_LABELS, SegmentCube  # noqa: E402
+from figures import clear_figures, figure_stats  # noqa: E402
+from synthetic import write_csv  # noqa: E402
+
+DEFAULT_SIZES = '1e5,1e6,1e7'
+PAGES = sorted(glob.glob(os.path.join(ROOT, 'streamlit_app', 'pages', '[2-5]_*.py')))
+
+# Differences below this are timer noise, never a regression
+MIN_DELTA_SECONDS = 0.002
+
+
+def dataset(rows, data_dir):
+    """Path of the seeded synthetic CSV with ``rows`` rows, generating it once"""
+    path = os.path.join(data_dir, f'synthetic_{rows}.csv')
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f'generating {rows:,} rows -> {path}', flush=True)
+        write_csv(path, rows)
+    return path
+
+
+def measure(fn, repeat):
+    """Best and median wall time over ``repeat`` runs, then peak allocation of one traced run"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'median_seconds': statistics.median(times), 'peak_mb': peak / 1024 ** 2}
+
+
+def _clear_caches():
+    data_store.clear_cache()
+    calculations._metrics_cache.clear()
+    calculations._cube_cache.clear()
+    calculations._quality_cache.clear()
+    clear_figures()
+
+
+def frame_cases(path):
+    """(name, callable) pairs timed against the dataset at ``path``"""
+    def load_data():
+        data_store.clear_cache()
+        calculations.load_data(path)
+
+    data = calculations.load_data(path)
+    cube = SegmentCube.from_frame(data)
+    ad_data = data[data['test group'] == 'ad']
+
+    def metrics():
+        calculations._metrics_cache.clear()
+        calculations.calculate_metrics(data)
+
+    def groupby_dose():
+        bins = pd.cut(ad_data['total ads'], bins=DOSE_BINS, labels=DOSE_LABELS)
+        return ad_data.groupby(bins, observed=True).agg({'converted': ['sum', 'count', 'mean']})
+
+    return [
+        ('load.csv_parse', lambda: data_store.read_csv_typed(path)),
+        ('load.load_data', load_data),
+        ('metrics.calculate_metrics', metrics),
+        ('analysis.groupby_counts', lambda: data.groupby(['test group', 'converted'], observed=True).size()),
+        ('analysis.groupby_rates', lambda: data.groupby('test group', observed=True)['converted'].mean()),
+        ('analysis.groupby_day', lambda: data.groupby(['test group', 'most ads day'],
+                                                      observed=True)['converted'].mean().unstack(level=0)),
+        ('analysis.groupby_hour', lambda: data.groupby(['test group', 'most ads hour'],
+                                                       observed=True)['converted'].mean().unstack(level=0)),
+        ('analysis.cut_dose_response', groupby_dose),
+        ('analysis.cube_build', lambda: SegmentCube.from_frame(data)),
+        ('analysis.cube_counts', lambda: cube.summary('test group')),
+        ('analysis.cube_day', lambda: cube.rate_table('most ads day')),
+        ('analysis.cube_hour', lambda: cube.rate_table('most ads hour')),
+        ('analysis.cube_dose_response', lambda: cube.summary('exposure', arm='ad', bins=DOSE_BINS,
+                                                              labels=DOSE_LABELS)),
+        ('tests.chi2_crosstab', lambda: stats.chi2_contingency(pd.crosstab(data['test group'],
+                                                                           data['converted']))),
+    ]
+
+
+def page_results(path, repeat):
+    """Cold page runs of pages 2-5 against ``path`` plus per-figure build times"""
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    data_store.DATA_PATH = path
+    # One untimed run per page writes the snapshot and pays streamlit's one-off
+    # setup, which also resets its log level; after that, page deprecation
+    # notices are silenced
+    for page in PAGES:
+        AppTest.from_file(page, default_timeout=600).run()
+    set_log_level('error')
+
+    for page in PAGES:
+        name = os.path.splitext(os.path.basename(page))[0]
+        builds = []
+
+        def run_page():
+            _clear_caches()
+            app = AppTest.from_file(page, default_timeout=600).run()
+            if app.exception:
+                raise RuntimeError(f'{name} failed: {app.exception[0].message}')
+            # Tracing slows every allocation, so only untraced runs count for figure timings
+            if not tracemalloc.is_tracing():
+                builds.append(figure_stats())
+
+        results[f'pages.{name}'] = measure(run_page, repeat)
+        for figure, rows in pd.concat(builds).groupby(level=0):
+            results[f'figures.{figure}'] = {'seconds': rows['build_ms'].min() / 1000,
+                                            'payload_kb': rows['payload_kb'].iloc[-1]}
+    return results
+
+
+def run(sizes, repeat, data_dir, skip):
+    results = []
+    for rows in sizes:
+        path = dataset(rows, data_dir)
+        _clear_caches()
+        cases = {}
+        for name, fn in frame_cases(path):
+            if not any(name.startswith(prefix) or name.split('.')[-1] == prefix for prefix in skip):
+                cases[name] = measure(fn, repeat)
+        if not {'pages', 'figures'} & set(skip):
+            cases.update(page_results(path, repeat))
+        for name, result in cases.items():
+            results.append({'case': name, 'rows': rows, **result})
+            print(f"{name:<40}{rows:>12,}{result['seconds'] * 1000:>12.2f} ms"
+                  + (f"{result['peak_mb']:>10.1f} MB" if 'peak_mb' in result else ''), flush=True)
+        _clear_caches()
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print each case next to its baseline; return the regressed cases"""
+    previous = {(r['case'], r['rows']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'case':<40}{'rows':>12}{'ms':>10}{'base ms':>10}{'ratio':>8}{'MB':>8}{'base MB':>9}")
+    for result in results:
+        base = previous.get((result['case'], result['rows']))
+        if base is None:
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] else float('inf')
+        slower = ratio > threshold and result['seconds'] - base['seconds'] > MIN_DELTA_SECONDS
+        bigger = ('peak_mb' in result and 'peak_mb' in base
+                  and result['peak_mb'] > threshold * base['peak_mb'] and result['peak_mb'] - base['peak_mb'] > 1)
+        flag = '  REGRESSION' if slower or bigger else ''
+        if flag:
+            regressions.append(result)
+        memory = (f"{result['peak_mb']:>8.1f}{base['peak_mb']:>9.1f}"
+                  if 'peak_mb' in result and 'peak_mb' in base else f"{'-':>8}{'-':>9}")
+        print(f"{result['case']:<40}{result['rows']:>12,}{result['seconds'] * 1000:>10.2f}"
+              f"{base['seconds'] * 1000:>10.2f}{ratio:>8.2f}{memory}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated row counts, e.g. 1e5,1e6')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'ab-bench'))
+    parser.add_argument('--skip', default='', help='comma-separated case names or prefixes to skip')
+    parser.add_argument('--out', help='write results JSON here')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown / memory growth ratio')
+    args = parser.parse_args()
+
+    sizes = [int(float(size)) for size in args.sizes.split(',')]
+    skip = [name for name in args.skip.split(',') if name]
+    results = run(sizes, args.repeat, args.data_dir, skip)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.2f}x '
+              f"(baseline {baseline['environment'].get('commit') or 'unknown'})")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Generate a synthetic experiment dataset for scale testing
+
+Writes either one CSV or a directory of CSV shards with columnar snapshots,
+one chunk at a time, so the output can be far larger than memory.
+
+    python benchmarks/generate_data.py OUT --rows 100_000_000 [--shards] [--chunk-rows 1_000_000]
+        [--seed 0] [--allocation ad=0.96,psa=0.04] [--base-rate 0.018] [--lift 0.43]
+        [--ads-median 13] [--ads-sigma 1.1] [--ads-elasticity 0.5]
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'streamlit_app', 'utils'))
+
+from synthetic import (ADS_ELASTICITY, ADS_MEDIAN, ADS_SIGMA, BASE_RATE, DEFAULT_CHUNK_ROWS,  # noqa: E402
+                       LIFT, write_csv, write_shards)
+from quality import EXPECTED_ALLOCATION, parse_allocation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('out', help='CSV path, or the shard directory with --shards')
+    parser.add_argument('--rows', type=lambda s: int(s.replace('_', '')), required=True)
+    parser.add_argument('--shards', action='store_true', help='write CSV shards with snapshots')
+    parser.add_argument('--chunk-rows', type=lambda s: int(s.replace('_', '')), default=DEFAULT_CHUNK_ROWS,
+                        help='rows per chunk (and per shard)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--allocation', type=parse_allocation,
+                        default=EXPECTED_ALLOCATION, help="e.g. 'ad=0.96,psa=0.04'")
+    parser.add_argument('--base-rate', type=float, default=BASE_RATE)
+    parser.add_argument('--lift', type=float, default=LIFT)
+    parser.add_argument('--ads-median', type=float, default=ADS_MEDIAN)
+    parser.add_argument('--ads-sigma', type=float, default=ADS_SIGMA)
+    parser.add_argument('--ads-elasticity', type=float, default=ADS_ELASTICITY)
+    args = parser.parse_args()
+
+    params = dict(seed=args.seed, allocation=args.allocation, base_rate=args.base_rate, lift=args.lift,
+                  ads_median=args.ads_median, ads_sigma=args.ads_sigma, ads_elasticity=args.ads_elasticity)
+    if args.shards:
+        stats = write_shards(args.out, args.rows, args.chunk_rows, **params)
+    else:
+        stats = write_csv(args.out, args.rows, args.chunk_rows, **params)
+
+    print(f"rows:         {stats['rows']:,}")
+    print(f"files:        {len(stats['paths'])}")
+    print(f"chunks:       {stats['chunks']}")
+    print(f"size:         {stats['bytes'] / 1024 ** 2:,.1f} MB")
+    print(f"time:         {stats['seconds']:.1f}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
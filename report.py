@@ -0,0 +1,52 @@
+"""
+Headless A/B test reports for one or many experiment files
+
+Runs the full analysis of the Streamlit app on every CSV given (files,
+directories or globs) in parallel worker processes. It writes one JSON and
+one static HTML report per experiment, plus summary.json and index.html.
+
+    python report.py Data/marketing_AB.csv [more.csv exports/ 'campaigns/*.csv'] --out reports/
+        [--workers N] [--alpha 0.05] [--draws 200000] [--allocation ad=0.96,psa=0.04] [--stream]
+
+The exit status is 1 if any experiment could not be analysed.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app', 'utils'))
+
+from quality import EXPECTED_ALLOCATION, parse_allocation  # noqa: E402
+from reporting import format_stat, run_reports  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('inputs', nargs='+', help='CSV files, directories or glob patterns')
+    parser.add_argument('--out', default='reports', help='output directory')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--draws', type=int, default=200_000, help='posterior draws for the Bayesian lift')
+    parser.add_argument('--allocation', type=parse_allocation, default=EXPECTED_ALLOCATION,
+                        help="planned arm shares for the SRM check, e.g. 'ad=0.96,psa=0.04'")
+    parser.add_argument('--stream', action='store_true',
+                        help='aggregate each CSV in chunks (skips the row-level quality checks)')
+    args = parser.parse_args()
+
+    summaries = run_reports(args.inputs, args.out, workers=args.workers, alpha=args.alpha,
+                            n_draws=args.draws, allocation=args.allocation, stream=args.stream)
+    failed = [s for s in summaries if s['status'] != 'ok']
+    for s in summaries:
+        if s['status'] == 'ok':
+            print(f"{s['name']:<32}{s['rows']:>12,}  lift {format_stat(s['lift'], '+6.1f')}%  "
+                  f"p={format_stat(s['p_value'], '.3g')}  "
+                  f"{s['recommendation']:<10}{s['seconds']:>7.2f}s")
+        else:
+            print(f"{s['name']:<32}  ERROR {s['error']}")
+    print(f"\n{len(summaries) - len(failed)}/{len(summaries)} reports written to "
+          f"{os.path.join(os.path.abspath(args.out), 'index.html')}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
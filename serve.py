@@ -0,0 +1,52 @@
+"""
+Read-only JSON metrics service for one or many experiment files
+
+Serves the metrics, segment breakdowns and dose-response tables of every CSV
+given (files, directories or globs) over HTTP, from an in-memory aggregate
+cache built on first request.
+
+    python serve.py Data/marketing_AB.csv [more.csv exports/ 'campaigns/*.csv']
+        [--host 127.0.0.1] [--port 8765] [--workers N] [--alpha 0.05] [--allocation ad=0.96,psa=0.04]
+        [--warm] [--stream]
+
+Try ``curl localhost:8765/experiments``.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app', 'utils'))
+
+from quality import EXPECTED_ALLOCATION, parse_allocation  # noqa: E402
+from service import DEFAULT_PORT, MetricsService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('inputs', nargs='+', help='CSV files, directories or glob patterns')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, help='threads building aggregates (default: one per CPU)')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--allocation', type=parse_allocation, default=EXPECTED_ALLOCATION,
+                        help="planned arm shares for the SRM check, e.g. 'ad=0.96,psa=0.04'")
+    parser.add_argument('--warm', action='store_true', help='build every experiment before accepting requests')
+    parser.add_argument('--stream', action='store_true', help='aggregate each CSV in chunks')
+    args = parser.parse_args()
+
+    service = MetricsService(args.inputs, workers=args.workers, alpha=args.alpha, allocation=args.allocation,
+                             stream=args.stream)
+
+    def ready(address):
+        print(f'Serving {len(service.cache.paths)} experiments on '
+              f'http://{address[0]}:{address[1]}/experiments', flush=True)
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, warm=args.warm, ready=ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
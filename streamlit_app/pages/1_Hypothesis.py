@@ -13,6 +13,7 @@ if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
 from helpers import apply_custom_css
+from power import required_sample_size, power_at, minimum_detectable_effect, exact_power, EXACT_MAX_USERS
 
 st.set_page_config(page_title="Hypothesis", page_icon="🔬", layout="wide")
 st.markdown(apply_custom_css(), unsafe_allow_html=True)
@@ -136,10 +137,60 @@ with col3:
     </div>
     """, unsafe_allow_html=True)
 
-st.markdown("""
+# Power calculator for the unequal (96/4) split
+st.subheader("Power & Minimum Detectable Effect")
+
+TOTAL_USERS = 588_101
+
+# H1 is one-sided (p_ad > p_psa)
+ALTERNATIVE = 'larger'
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    baseline = st.slider("Baseline (PSA) conversion rate (%)", 0.5, 10.0, 1.8, 0.1) / 100
+    mde = st.slider("Relative lift to detect (%)", 1, 100, 20) / 100
+
+with col2:
+    allocation = st.slider("Share of users in the ad group (%)", 5, 98, 96) / 100
+    total_users = st.number_input("Total users", min_value=1_000, max_value=1_000_000_000,
+                                  value=TOTAL_USERS, step=10_000)
+
+with col3:
+    alpha = st.select_slider("Significance level (α)", [0.01, 0.025, 0.05, 0.1], value=0.05)
+    target_power = st.slider("Target power", 0.5, 0.99, 0.8, 0.01)
+
+needed = required_sample_size(baseline, mde, allocation, alpha, target_power, ALTERNATIVE)
+achieved = power_at(baseline, mde, total_users, allocation, alpha, ALTERNATIVE)
+detectable = minimum_detectable_effect(baseline, total_users, allocation, alpha, target_power, ALTERNATIVE)
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric("Users Needed", f"{needed:,.0f}")
+
+with col2:
+    st.metric("Power at Current Sample", f"{achieved*100:.1f}%")
+
+with col3:
+    st.metric("Minimum Detectable Lift", f"{detectable*100:.1f}%")
+
+with st.expander("Validate against exact binomial power"):
+    if total_users <= EXACT_MAX_USERS:
+        exact = exact_power(baseline, mde, total_users, allocation, alpha, ALTERNATIVE)
+        st.write(f"Exact power of the z-test at {total_users:,} users: "
+                 f"**{exact*100:.1f}%** (normal approximation: {achieved*100:.1f}%)")
+    else:
+        st.caption(f"The exact check runs up to {EXACT_MAX_USERS:,} users; at larger samples the normal "
+                   "approximation is accurate and the binomial sum gets slow.")
+
+st.markdown(f"""
 <div class="info-box">
-<strong>Statistical Power:</strong> The large sample size ensures we can detect even small differences 
-in conversion rates with high confidence.
+<strong>Statistical Power:</strong> With {total_users:,} users split {allocation*100:.0f}/{(1-allocation)*100:.0f},
+the test detects a relative lift of {detectable*100:.1f}% over a {baseline*100:.1f}% baseline with
+{target_power*100:.0f}% power. The small PSA group, not the total, limits sensitivity: an even split would need
+{required_sample_size(baseline, mde, 0.5, alpha, target_power, ALTERNATIVE):,.0f} users to detect a {mde*100:.0f}% lift
+instead of {needed:,.0f}.
 </div>
 """, unsafe_allow_html=True)
 
@@ -14,16 +14,24 @@ utils_dir = os.path.join(parent_dir, 'utils')
 if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
-from helpers import apply_custom_css, load_data
+from helpers import apply_custom_css, load_data, get_quality_report, dataset_fingerprint
+from figures import cached_figure
+from instrumentation import begin_rerun, section, end_rerun
+from panels import timing_panel
 
 st.set_page_config(page_title="Data Overview", page_icon="📁", layout="wide")
 st.markdown(apply_custom_css(), unsafe_allow_html=True)
+begin_rerun('overview')
 
 st.title("Data Overview")
 
-# Load data
+section('Load data')
+# Load data; quality checks run once per dataset and are cached
 data = load_data()
+fingerprint = dataset_fingerprint(data)
+quality = get_quality_report(data)
 
+section('Dataset Summary')
 # Dataset summary
 st.header("Dataset Summary")
 
@@ -33,7 +41,7 @@ with col1:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-label">Total Records</div>
-        <div class="metric-value">{len(data):,}</div>
+        <div class="metric-value">{quality['rows']:,}</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -41,7 +49,7 @@ with col2:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-label">Features</div>
-        <div class="metric-value">{len(data.columns)}</div>
+        <div class="metric-value">{quality['columns']}</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -49,7 +57,7 @@ with col3:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-label">Missing Values</div>
-        <div class="metric-value">{data.isnull().sum().sum()}</div>
+        <div class="metric-value">{quality['null_total']}</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -57,12 +65,13 @@ with col4:
     st.markdown(f"""
     <div class="metric-card">
         <div class="metric-label">Duplicate Rows</div>
-        <div class="metric-value">{data.duplicated().sum()}</div>
+        <div class="metric-value">{quality['duplicate_rows']}</div>
     </div>
     """, unsafe_allow_html=True)
 
 st.markdown("---")
 
+section('Data Dictionary')
 # Data dictionary
 st.header("Data Dictionary")
 
@@ -83,51 +92,104 @@ st.dataframe(dict_df, use_container_width=True, hide_index=True)
 
 st.markdown("---")
 
+section('Sample Data')
 # Sample data
 st.header("Sample Data")
 st.dataframe(data.head(10), use_container_width=True)
 
 st.markdown("---")
 
+section('Test Group Distribution')
 # Group distribution
 st.header("Test Group Distribution")
 
-test_group_counts = data['test group'].value_counts()
+test_group_counts = quality['arm_counts'].sort_values(ascending=False)
 test_group_pct = (test_group_counts / test_group_counts.sum() * 100).round(2)
 
-fig = go.Figure(data=[
-    go.Bar(
-        x=test_group_counts.index.str.upper(),
-        y=test_group_counts.values,
-        text=[f'{count:,}<br>({pct}%)' for count, pct in zip(test_group_counts.values, test_group_pct.values)],
-        textposition='outside',
-        marker=dict(
-            color=['#667eea', '#f093fb'],
-            line=dict(color='#34495e', width=2),
-            opacity=0.9
-        ),
-        hovertemplate='<b>%{x}</b><br>Users: %{y:,}<extra></extra>'
+def build_fig():
+    fig = go.Figure(data=[
+        go.Bar(
+            x=test_group_counts.index.str.upper(),
+            y=test_group_counts.values,
+            text=[f'{count:,}<br>({pct}%)' for count, pct in zip(test_group_counts.values, test_group_pct.values)],
+            textposition='outside',
+            marker=dict(
+                color=['#667eea', '#f093fb', '#4facfe', '#51cf66', '#ffd93d'][:len(test_group_counts)],
+                line=dict(color='#34495e', width=2),
+                opacity=0.9
+            ),
+            hovertemplate='<b>%{x}</b><br>Users: %{y:,}<extra></extra>'
+        )
+    ])
+
+    fig.update_layout(
+        title={'text': 'User Distribution by Test Group', 'x': 0.5, 'xanchor': 'center',
+               'font': {'size': 20, 'color': '#2c3e50'}},
+        xaxis_title='Test Group',
+        yaxis_title='Number of Users',
+        height=500,
+        plot_bgcolor='#f8f9fa',
+        paper_bgcolor='white',
+        showlegend=False
     )
-])
-
-fig.update_layout(
-    title={'text': 'User Distribution by Test Group', 'x': 0.5, 'xanchor': 'center',
-           'font': {'size': 20, 'color': '#2c3e50'}},
-    xaxis_title='Test Group',
-    yaxis_title='Number of Users',
-    height=500,
-    plot_bgcolor='#f8f9fa',
-    paper_bgcolor='white',
-    showlegend=False
-)
+    return fig
+
+fig = cached_figure('overview.group_distribution', fingerprint, build_fig)
 
 st.plotly_chart(fig, use_container_width=True)
 
-st.markdown("""
-<div class="success-box">
-<strong>Randomization Check:</strong> Both groups are well-represented, ensuring sufficient statistical power.
-</div>
-""", unsafe_allow_html=True)
+srm = quality['srm']
+split = ' / '.join(f"{arm.upper()} {share*100:.2f}%" for arm, share in srm['observed_share'].items())
+planned = ' / '.join(f"{share*100:.0f}%" for share in srm['expected_share'].values())
+if srm['equal_shares']:
+    planned += ' (equal shares assumed; these arms are not in the configured allocation)'
+
+if srm['mismatch']:
+    st.markdown(f"""
+    <div class="warning-box">
+    <strong>Sample Ratio Mismatch:</strong> Observed split {split} differs from the planned {planned}
+    (χ² = {srm['chi2']:.2f}, p = {srm['p_value']:.2e}). Check assignment and logging before trusting any result.
+    </div>
+    """, unsafe_allow_html=True)
+else:
+    st.markdown(f"""
+    <div class="success-box">
+    <strong>Randomization Check:</strong> Observed split {split} matches the planned {planned}
+    (SRM χ² = {srm['chi2']:.2f}, p = {srm['p_value']:.3f}).
+    </div>
+    """, unsafe_allow_html=True)
+
+st.markdown("---")
+
+section('Data Quality Checks')
+# Data quality
+st.header("Data Quality Checks")
+
+checks_df = pd.DataFrame({
+    'Check': ['Sample ratio (SRM)', 'Duplicate user IDs', 'Users in both groups', 'Missing values',
+              'Out-of-range values'],
+    'Result': [
+        f"p = {srm['p_value']:.3g}",
+        f"{quality['duplicate_ids']:,} IDs ({quality['duplicate_rows']:,} exact duplicate rows)",
+        f"{quality['conflicting_assignments']:,}",
+        f"{quality['null_total']:,}",
+        f"{sum(quality['range_violations'].values()):,}"
+    ],
+    'Status': [
+        'FAIL' if srm['mismatch'] else 'PASS',
+        'FAIL' if quality['duplicate_ids'] else 'PASS',
+        'FAIL' if quality['conflicting_assignments'] else 'PASS',
+        'FAIL' if quality['null_total'] else 'PASS',
+        'FAIL' if any(quality['range_violations'].values()) else 'PASS'
+    ]
+})
+
+st.dataframe(checks_df, use_container_width=True, hide_index=True)
+st.caption(f"Checks ran in {quality['seconds']*1000:.0f} ms on first load and are reused on every rerun.")
 
 st.markdown("---")
 st.info("Next: View the Analysis page for conversion insights")
+
+end_rerun()
+
+timing_panel('overview', 'overview.')
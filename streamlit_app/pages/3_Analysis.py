@@ -2,9 +2,9 @@
 Analysis Page - Interactive Visualizations
 """
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
+import pandas as pd
 import sys
 import os
 
@@ -15,17 +15,33 @@ utils_dir = os.path.join(parent_dir, 'utils')
 if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
-from helpers import apply_custom_css, load_data, calculate_metrics
+from helpers import apply_custom_css, load_data, get_cube, dataset_fingerprint
+from figures import cached_figure
+from instrumentation import begin_rerun, section, end_rerun
+from panels import timing_panel
+from cube import DOSE_BINS, DOSE_LABELS
+from multiarm import split_arms
+from stratified import stratified_analysis
 
 st.set_page_config(page_title="Analysis", page_icon="📊", layout="wide")
 st.markdown(apply_custom_css(), unsafe_allow_html=True)
+begin_rerun('analysis')
 
 st.title("Exploratory Data Analysis")
 
-# Load data and metrics
+section('Load data')
+# Load data; every table below is a marginal of the cached cube
 data = load_data()
-metrics = calculate_metrics(data)
+fingerprint = dataset_fingerprint(data)
+cube = get_cube(data)
+arm_summary = cube.summary('test group')
+control, treatments = split_arms(cube.arms)
 
+# One colour/marker per arm; the control arm is always drawn dashed
+ARM_COLORS = ['#667eea', '#f093fb', '#4facfe', '#51cf66', '#ffd93d', '#ff6b6b', '#00f2fe', '#764ba2']
+arm_colors = {arm: ARM_COLORS[i % len(ARM_COLORS)] for i, arm in enumerate(treatments + [control])}
+
+section('Conversion Analysis')
 # Section 1: Conversion Analysis
 st.header("1. Conversion Analysis")
 
@@ -33,82 +49,90 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Conversion counts
-    conversion_data = data.groupby(['test group', 'converted']).size().reset_index(name='count')
-    not_conv = conversion_data[conversion_data['converted'] == False].set_index('test group')['count']
-    conv = conversion_data[conversion_data['converted'] == True].set_index('test group')['count']
-    
-    fig1 = go.Figure()
-    fig1.add_trace(go.Bar(
-        name='Not Converted', 
-        x=not_conv.index.str.upper(), 
-        y=not_conv.values,
-        marker=dict(color='#ff6b6b', line=dict(color='#c92a2a', width=2)),
-        text=[f'{v:,}' for v in not_conv.values],
-        textposition='outside',
-        hovertemplate='<b>%{x}</b><br>Not Converted: %{y:,}<extra></extra>'
-    ))
+    conv = arm_summary['Conversions']
+    not_conv = arm_summary['Total_Users'] - conv
     
-    fig1.add_trace(go.Bar(
-        name='Converted',
-        x=conv.index.str.upper(),
-        y=conv.values,
-        marker=dict(color='#51cf66', line=dict(color='#2f9e44', width=2)),
-        text=[f'{v:,}' for v in conv.values],
-        textposition='outside',
-        hovertemplate='<b>%{x}</b><br>Converted: %{y:,}<extra></extra>'
-    ))
+    def build_fig1():
+        fig1 = go.Figure()
+        fig1.add_trace(go.Bar(
+            name='Not Converted', 
+            x=not_conv.index.str.upper(), 
+            y=not_conv.values,
+            marker=dict(color='#ff6b6b', line=dict(color='#c92a2a', width=2)),
+            text=[f'{v:,}' for v in not_conv.values],
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Not Converted: %{y:,}<extra></extra>'
+        ))
     
-    fig1.update_layout(
-        title={'text': 'User Conversion by Test Group', 'x': 0.5, 'xanchor': 'center'},
-        xaxis_title='Test Group',
-        yaxis_title='Number of Users',
-        barmode='group',
-        height=450,
-        plot_bgcolor='#f8f9fa',
-        showlegend=True
-    )
+        fig1.add_trace(go.Bar(
+            name='Converted',
+            x=conv.index.str.upper(),
+            y=conv.values,
+            marker=dict(color='#51cf66', line=dict(color='#2f9e44', width=2)),
+            text=[f'{v:,}' for v in conv.values],
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Converted: %{y:,}<extra></extra>'
+        ))
+    
+        fig1.update_layout(
+            title={'text': 'User Conversion by Test Group', 'x': 0.5, 'xanchor': 'center'},
+            xaxis_title='Test Group',
+            yaxis_title='Number of Users',
+            barmode='group',
+            height=450,
+            plot_bgcolor='#f8f9fa',
+            showlegend=True
+        )
+        return fig1
+    
+    fig1 = cached_figure('analysis.conversion_counts', fingerprint, build_fig1)
     
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
     # Conversion rates
-    conv_rates = data.groupby('test group')['converted'].mean() * 100
-    diff = abs(conv_rates.iloc[0] - conv_rates.iloc[1])
-    
-    fig2 = go.Figure(data=[go.Bar(
-        x=conv_rates.index.str.upper(),
-        y=conv_rates.values,
-        marker=dict(color=['#4facfe', '#00f2fe'], line=dict(color='#0077b6', width=2)),
-        text=[f'{v:.2f}%' for v in conv_rates.values],
-        textposition='outside',
-        hovertemplate='<b>%{x}</b><br>Rate: %{y:.2f}%<extra></extra>'
-    )])
-    
-    fig2.add_annotation(
-        x=0.5, y=max(conv_rates.values) * 0.5,
-        xref='paper', yref='y',
-        text=f'Difference: {diff:.2f}%',
-        showarrow=False,
-        font=dict(size=14, color='#2c3e50'),
-        bgcolor='#ffd93d',
-        bordercolor='#f59f00',
-        borderwidth=2,
-        borderpad=10
-    )
+    conv_rates = arm_summary['Conversion_Rate'] * 100
+    diff = conv_rates.max() - conv_rates.min()
     
-    fig2.update_layout(
-        title={'text': 'Conversion Rate Comparison', 'x': 0.5, 'xanchor': 'center'},
-        xaxis_title='Test Group',
-        yaxis_title='Conversion Rate (%)',
-        height=450,
-        plot_bgcolor='#f8f9fa',
-        showlegend=False
-    )
+    def build_fig2():
+        fig2 = go.Figure(data=[go.Bar(
+            x=conv_rates.index.str.upper(),
+            y=conv_rates.values,
+            marker=dict(color=[arm_colors[arm] for arm in conv_rates.index], line=dict(color='#0077b6', width=2)),
+            text=[f'{v:.2f}%' for v in conv_rates.values],
+            textposition='outside',
+            hovertemplate='<b>%{x}</b><br>Rate: %{y:.2f}%<extra></extra>'
+        )])
+    
+        fig2.add_annotation(
+            x=0.5, y=max(conv_rates.values) * 0.5,
+            xref='paper', yref='y',
+            text=f'Difference: {diff:.2f}%' if len(conv_rates) == 2 else f'Spread: {diff:.2f}%',
+            showarrow=False,
+            font=dict(size=14, color='#2c3e50'),
+            bgcolor='#ffd93d',
+            bordercolor='#f59f00',
+            borderwidth=2,
+            borderpad=10
+        )
+    
+        fig2.update_layout(
+            title={'text': 'Conversion Rate Comparison', 'x': 0.5, 'xanchor': 'center'},
+            xaxis_title='Test Group',
+            yaxis_title='Conversion Rate (%)',
+            height=450,
+            plot_bgcolor='#f8f9fa',
+            showlegend=False
+        )
+        return fig2
+    
+    fig2 = cached_figure('analysis.conversion_rates', fingerprint, build_fig2)
     
     st.plotly_chart(fig2, use_container_width=True)
 
 st.markdown("---")
 
+section('Temporal Consistency')
 # Section 2: Temporal Consistency
 st.header("2. Temporal Consistency")
 
@@ -118,126 +142,167 @@ col1, col2 = st.columns(2)
 
 with col1:
     # By day
-    day_conv = data.groupby(['test group', 'most ads day'])['converted'].mean() * 100
-    day_conv_pivot = day_conv.unstack(level=0)
+    day_conv_pivot = cube.rate_table('most ads day')
     
-    fig3 = go.Figure()
-    fig3.add_trace(go.Scatter(
-        x=day_conv_pivot.index,
-        y=day_conv_pivot['ad'],
-        mode='lines+markers',
-        name='Ad Group',
-        line=dict(color='#667eea', width=3),
-        marker=dict(size=10, symbol='circle'),
-        hovertemplate='<b>%{x}</b><br>Ad: %{y:.2f}%<extra></extra>'
-    ))
-    fig3.add_trace(go.Scatter(
-        x=day_conv_pivot.index,
-        y=day_conv_pivot['psa'],
-        mode='lines+markers',
-        name='PSA Group',
-        line=dict(color='#f093fb', width=3, dash='dash'),
-        marker=dict(size=10, symbol='diamond'),
-        hovertemplate='<b>%{x}</b><br>PSA: %{y:.2f}%<extra></extra>'
-    ))
+    def build_fig3():
+        fig3 = go.Figure()
+        for arm in treatments + [control]:
+            fig3.add_trace(go.Scatter(
+                x=day_conv_pivot.index,
+                y=day_conv_pivot[arm],
+                mode='lines+markers',
+                name=f'{arm.upper()} Group',
+                line=dict(color=arm_colors[arm], width=3, dash='dash' if arm == control else None),
+                marker=dict(size=10, symbol='diamond' if arm == control else 'circle'),
+                hovertemplate=f'<b>%{{x}}</b><br>{arm.upper()}: %{{y:.2f}}%<extra></extra>'
+            ))
     
-    fig3.update_layout(
-        title={'text': 'Conversion Rate by Day of Week', 'x': 0.5, 'xanchor': 'center'},
-        xaxis_title='Day',
-        yaxis_title='Conversion Rate (%)',
-        height=450,
-        plot_bgcolor='#f8f9fa'
-    )
+        fig3.update_layout(
+            title={'text': 'Conversion Rate by Day of Week', 'x': 0.5, 'xanchor': 'center'},
+            xaxis_title='Day',
+            yaxis_title='Conversion Rate (%)',
+            height=450,
+            plot_bgcolor='#f8f9fa'
+        )
+        return fig3
+    
+    fig3 = cached_figure('analysis.rate_by_day', fingerprint, build_fig3)
     
     st.plotly_chart(fig3, use_container_width=True)
 
 with col2:
     # By hour
-    hour_conv = data.groupby(['test group', 'most ads hour'])['converted'].mean() * 100
-    hour_conv_pivot = hour_conv.unstack(level=0)
+    hour_conv_pivot = cube.rate_table('most ads hour')
     
-    fig4 = go.Figure()
-    fig4.add_trace(go.Scatter(
-        x=hour_conv_pivot.index,
-        y=hour_conv_pivot['ad'],
-        mode='lines+markers',
-        name='Ad Group',
-        line=dict(color='#4facfe', width=3),
-        marker=dict(size=8),
-        hovertemplate='<b>Hour %{x}</b><br>Ad: %{y:.2f}%<extra></extra>'
-    ))
-    fig4.add_trace(go.Scatter(
-        x=hour_conv_pivot.index,
-        y=hour_conv_pivot['psa'],
-        mode='lines+markers',
-        name='PSA Group',
-        line=dict(color='#00f2fe', width=3, dash='dash'),
-        marker=dict(size=8, symbol='diamond'),
-        hovertemplate='<b>Hour %{x}</b><br>PSA: %{y:.2f}%<extra></extra>'
-    ))
+    def build_fig4():
+        fig4 = go.Figure()
+        for arm in treatments + [control]:
+            fig4.add_trace(go.Scatter(
+                x=hour_conv_pivot.index,
+                y=hour_conv_pivot[arm],
+                mode='lines+markers',
+                name=f'{arm.upper()} Group',
+                line=dict(color=arm_colors[arm], width=3, dash='dash' if arm == control else None),
+                marker=dict(size=8, symbol='diamond' if arm == control else 'circle'),
+                hovertemplate=f'<b>Hour %{{x}}</b><br>{arm.upper()}: %{{y:.2f}}%<extra></extra>'
+            ))
     
-    fig4.update_layout(
-        title={'text': 'Conversion Rate by Hour of Day', 'x': 0.5, 'xanchor': 'center'},
-        xaxis_title='Hour',
-        yaxis_title='Conversion Rate (%)',
-        height=450,
-        plot_bgcolor='#f8f9fa'
-    )
+        fig4.update_layout(
+            title={'text': 'Conversion Rate by Hour of Day', 'x': 0.5, 'xanchor': 'center'},
+            xaxis_title='Hour',
+            yaxis_title='Conversion Rate (%)',
+            height=450,
+            plot_bgcolor='#f8f9fa'
+        )
+        return fig4
+    
+    fig4 = cached_figure('analysis.rate_by_hour', fingerprint, build_fig4)
     
     st.plotly_chart(fig4, use_container_width=True)
 
-days_ad_higher = (day_conv_pivot['ad'] > day_conv_pivot['psa']).sum()
-hours_ad_higher = (hour_conv_pivot['ad'] > hour_conv_pivot['psa']).sum()
+consistency = '<br>'.join(
+    f"{arm.upper()} conversion rate is higher than {control.upper()} on "
+    f"{(day_conv_pivot[arm] > day_conv_pivot[control]).sum()}/{len(day_conv_pivot)} days "
+    f"and in {(hour_conv_pivot[arm] > hour_conv_pivot[control]).sum()}/{len(hour_conv_pivot)} hours."
+    for arm in treatments
+)
 
 st.markdown(f"""
-<div class="success-box">
+<div class="info-box">
 <strong>Consistency Check:</strong><br>
-Ad conversion rate is higher on {days_ad_higher}/{len(day_conv_pivot)} days 
-and in {hours_ad_higher}/{len(hour_conv_pivot)} hours.<br>
-The ad advantage is <strong>consistent across temporal dimensions</strong>.
+{consistency}<br>
+Whether the lift genuinely differs by day or hour is tested by the heterogeneity p-values below.
 </div>
 """, unsafe_allow_html=True)
 
+section('Stratified Tests')
+# Stratified tests: CMH pools the per-stratum 2x2 tables, Woolf tests whether the effect differs by stratum
+st.subheader("Stratified Tests")
+
+for arm in treatments:
+    strat = {dim: stratified_analysis(cube, dim, treatment=arm, control=control)
+             for dim in ('most ads day', 'most ads hour')}
+    strat_df = pd.DataFrame({
+        'Strata': ['Day of week', 'Hour of day'],
+        'CMH χ²': [f"{r['cmh']:.2f}" for r in strat.values()],
+        'CMH P-Value': [f"{r['cmh_p']:.2e}" for r in strat.values()],
+        'Pooled Odds Ratio (95% CI)': [
+            f"{r['odds_ratio']:.3f} [{r['odds_ratio_ci'][0]:.3f}, {r['odds_ratio_ci'][1]:.3f}]"
+            for r in strat.values()
+        ],
+        'MH Risk Difference': [f"{r['risk_diff']*100:.2f}pp" for r in strat.values()],
+        'Heterogeneity P-Value (Woolf)': [f"{r['heterogeneity_p']:.3f}" for r in strat.values()]
+    })
+    if len(treatments) > 1:
+        st.markdown(f"**{arm.upper()} vs {control.upper()}**")
+    st.dataframe(strat_df, use_container_width=True, hide_index=True)
+
+    day_strata = strat['most ads day']['strata']
+    def build_fig_strata():
+        fig_strata = go.Figure(go.Scatter(
+            x=day_strata['lift'],
+            y=day_strata.index.astype(str),
+            mode='markers',
+            marker=dict(size=12, color=arm_colors[arm]),
+            error_x=dict(
+                type='data', symmetric=False,
+                array=(day_strata['ci_upper'] - day_strata['abs_diff']) / day_strata['control_rate'] * 100,
+                arrayminus=(day_strata['abs_diff'] - day_strata['ci_lower']) / day_strata['control_rate'] * 100
+            ),
+            hovertemplate='<b>%{y}</b><br>Lift: %{x:.1f}%<extra></extra>'
+        ))
+        fig_strata.add_vline(x=0, line_dash='dash', line_color='#c92a2a')
+        fig_strata.update_layout(
+            title={'text': f'Relative Lift by Day ({arm.upper()} vs {control.upper()}, 95% CI)', 'x': 0.5, 'xanchor': 'center'},
+            xaxis_title='Relative Lift (%)',
+            yaxis_title='Day',
+            height=400,
+            plot_bgcolor='#f8f9fa'
+        )
+        return fig_strata
+    
+    fig_strata = cached_figure('analysis.lift_by_day', (fingerprint, arm), build_fig_strata)
+    
+    st.plotly_chart(fig_strata, use_container_width=True)
+
 st.markdown("---")
 
+section('Dose-Response Analysis')
 # Section 3: Dose-Response
 st.header("3. Dose-Response Analysis")
 
 st.markdown("Exploring the relationship between ad frequency and conversion rate:")
 
 # Prepare dose-response data
-ad_data = data[data['test group'] == 'ad'].copy()
-bins = [0, 25, 50, 100, 150, 200, 250, 300, 400, 2500]
-labels = ['1-25', '26-50', '51-100', '101-150', '151-200', '201-250', '251-300', '301-400', '400+']
-ad_data['ad_bin'] = pd.cut(ad_data['total ads'], bins=bins, labels=labels)
-
-dose_response = ad_data.groupby('ad_bin').agg({
-    'converted': ['sum', 'count', 'mean']
-}).round(4)
-dose_response.columns = ['Conversions', 'Total_Users', 'Conversion_Rate']
+dose_arm = st.selectbox("Arm", treatments) if len(treatments) > 1 else treatments[0]
+dose_response = cube.summary('exposure', arm=dose_arm, bins=DOSE_BINS, labels=DOSE_LABELS).round(4)
 dose_response['Conversion_Rate_Pct'] = dose_response['Conversion_Rate'] * 100
 
 dose_response_filtered = dose_response[dose_response['Total_Users'] >= 100]
 
-fig5 = go.Figure()
-fig5.add_trace(go.Scatter(
-    x=dose_response_filtered.index.astype(str),
-    y=dose_response_filtered['Conversion_Rate_Pct'],
-    mode='lines+markers',
-    line=dict(color='#667eea', width=4),
-    marker=dict(size=12, color='#764ba2', line=dict(color='white', width=2)),
-    fill='tozeroy',
-    fillcolor='rgba(102, 126, 234, 0.2)',
-    hovertemplate='<b>%{x} ads</b><br>Conversion: %{y:.2f}%<extra></extra>'
-))
-
-fig5.update_layout(
-    title={'text': 'Ad Frequency vs Conversion Rate', 'x': 0.5, 'xanchor': 'center'},
-    xaxis_title='Number of Ads Shown',
-    yaxis_title='Conversion Rate (%)',
-    height=450,
-    plot_bgcolor='#f8f9fa'
-)
+def build_fig5():
+    fig5 = go.Figure()
+    fig5.add_trace(go.Scatter(
+        x=dose_response_filtered.index.astype(str),
+        y=dose_response_filtered['Conversion_Rate_Pct'],
+        mode='lines+markers',
+        line=dict(color='#667eea', width=4),
+        marker=dict(size=12, color='#764ba2', line=dict(color='white', width=2)),
+        fill='tozeroy',
+        fillcolor='rgba(102, 126, 234, 0.2)',
+        hovertemplate='<b>%{x} ads</b><br>Conversion: %{y:.2f}%<extra></extra>'
+    ))
+
+    fig5.update_layout(
+        title={'text': 'Ad Frequency vs Conversion Rate', 'x': 0.5, 'xanchor': 'center'},
+        xaxis_title='Number of Ads Shown',
+        yaxis_title='Conversion Rate (%)',
+        height=450,
+        plot_bgcolor='#f8f9fa'
+    )
+    return fig5
+
+fig5 = cached_figure('analysis.dose_response', (fingerprint, dose_arm), build_fig5)
 
 st.plotly_chart(fig5, use_container_width=True)
 
@@ -253,3 +318,7 @@ This suggests diminishing returns beyond a certain ad exposure threshold.
 
 st.markdown("---")
 st.info("Next: View Statistical Tests for hypothesis validation")
+
+end_rerun()
+
+timing_panel('analysis', 'analysis.')
@@ -14,17 +14,32 @@ utils_dir = os.path.join(parent_dir, 'utils')
 if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
-from helpers import apply_custom_css, load_data, calculate_metrics
+from helpers import (apply_custom_css, load_data, calculate_metrics, calculate_arm_comparisons,
+                     calculate_adjusted_effect, get_cube, dataset_fingerprint)
+from figures import cached_figure
+from instrumentation import begin_rerun, section, end_rerun
+from panels import timing_panel
+from sequential import msprt
+from bootstrap import bootstrap_intervals
+from bayesian import bayesian_summary
+from multiarm import split_arms
 
 st.set_page_config(page_title="Statistical Tests", page_icon="🔬", layout="wide")
 st.markdown(apply_custom_css(), unsafe_allow_html=True)
+begin_rerun('tests')
 
 st.title("Statistical Hypothesis Testing")
 
+section('Load data')
 # Load data and calculate metrics
 data = load_data()
-m = calculate_metrics(data)
+fingerprint = dataset_fingerprint(data)
+control, treatments = split_arms(get_cube(data).arms)
+treatment = st.selectbox("Treatment arm", treatments) if len(treatments) > 1 else treatments[0]
+m = calculate_metrics(data, treatment=treatment, control=control)
+TREATMENT, CONTROL = treatment.upper(), control.upper()
 
+section('Test Summary')
 # Test summary
 st.header("Test Summary")
 
@@ -59,6 +74,7 @@ with col3:
 
 st.markdown("---")
 
+section('Two-Proportion Z-Test')
 # Test 1: Two-Proportion Z-Test
 st.header("1. Two-Proportion Z-Test")
 
@@ -67,8 +83,8 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.markdown(f"""
     **Hypotheses:**
-    - H₀: p_ad = p_psa
-    - H₁: p_ad > p_psa
+    - H₀: p_{treatment} = p_{control}
+    - H₁: p_{treatment} > p_{control}
     
     **Test Statistic:** z = {m['z_stat']:.4f}  
     **P-Value:** {m['p_value']:.6f}  
@@ -79,10 +95,10 @@ with col1:
 
 with col2:
     if m['p_value'] < 0.05:
-        st.markdown("""
+        st.markdown(f"""
         <div class="success-box">
         <strong>Result:</strong><br>
-        Strong evidence that ads increase conversion rate.
+        Strong evidence that {TREATMENT} increases the conversion rate.
         </div>
         """, unsafe_allow_html=True)
     else:
@@ -95,45 +111,50 @@ with col2:
 
 st.markdown("---")
 
+section('Confidence Intervals')
 # Test 2: Confidence Intervals
 st.header("2. Confidence Intervals (95%)")
 
 # Create visualization
-fig_ci = go.Figure()
-
-groups = ['AD', 'PSA']
-rates = [m['ad_rate'] * 100, m['psa_rate'] * 100]
-ci_lower = [m['ad_ci'][0] * 100, m['psa_ci'][0] * 100]
-ci_upper = [m['ad_ci'][1] * 100, m['psa_ci'][1] * 100]
-
-for i, group in enumerate(groups):
-    fig_ci.add_trace(go.Scatter(
-        x=[rates[i]],
-        y=[group],
-        mode='markers',
-        marker=dict(size=15, color=['#667eea', '#f093fb'][i]),
-        name=group,
-        showlegend=False,
-        hovertemplate=f'<b>{group}</b><br>Rate: {rates[i]:.2f}%<extra></extra>'
-    ))
+def build_fig_ci():
+    fig_ci = go.Figure()
+
+    groups = [TREATMENT, CONTROL]
+    rates = [m['ad_rate'] * 100, m['psa_rate'] * 100]
+    ci_lower = [m['ad_ci'][0] * 100, m['psa_ci'][0] * 100]
+    ci_upper = [m['ad_ci'][1] * 100, m['psa_ci'][1] * 100]
+
+    for i, group in enumerate(groups):
+        fig_ci.add_trace(go.Scatter(
+            x=[rates[i]],
+            y=[group],
+            mode='markers',
+            marker=dict(size=15, color=['#667eea', '#f093fb'][i]),
+            name=group,
+            showlegend=False,
+            hovertemplate=f'<b>{group}</b><br>Rate: {rates[i]:.2f}%<extra></extra>'
+        ))
     
-    fig_ci.add_trace(go.Scatter(
-        x=[ci_lower[i], ci_upper[i]],
-        y=[group, group],
-        mode='lines',
-        line=dict(color=['#667eea', '#f093fb'][i], width=4),
-        showlegend=False,
-        hovertemplate=f'95% CI: [{ci_lower[i]:.2f}%, {ci_upper[i]:.2f}%]<extra></extra>'
-    ))
-
-fig_ci.update_layout(
-    title={'text': 'Conversion Rates with 95% Confidence Intervals', 'x': 0.5, 'xanchor': 'center'},
-    xaxis_title='Conversion Rate (%)',
-    yaxis_title='Test Group',
-    height=350,
-    plot_bgcolor='#f8f9fa',
-    showlegend=False
-)
+        fig_ci.add_trace(go.Scatter(
+            x=[ci_lower[i], ci_upper[i]],
+            y=[group, group],
+            mode='lines',
+            line=dict(color=['#667eea', '#f093fb'][i], width=4),
+            showlegend=False,
+            hovertemplate=f'95% CI: [{ci_lower[i]:.2f}%, {ci_upper[i]:.2f}%]<extra></extra>'
+        ))
+
+    fig_ci.update_layout(
+        title={'text': 'Conversion Rates with 95% Confidence Intervals', 'x': 0.5, 'xanchor': 'center'},
+        xaxis_title='Conversion Rate (%)',
+        yaxis_title='Test Group',
+        height=350,
+        plot_bgcolor='#f8f9fa',
+        showlegend=False
+    )
+    return fig_ci
+
+fig_ci = cached_figure('tests.confidence_intervals', (fingerprint, treatment), build_fig_ci)
 
 st.plotly_chart(fig_ci, use_container_width=True)
 
@@ -141,10 +162,10 @@ st.plotly_chart(fig_ci, use_container_width=True)
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    st.metric("Ad Group CI", f"[{m['ad_ci'][0]*100:.2f}%, {m['ad_ci'][1]*100:.2f}%]")
+    st.metric(f"{TREATMENT} Group CI", f"[{m['ad_ci'][0]*100:.2f}%, {m['ad_ci'][1]*100:.2f}%]")
 
 with col2:
-    st.metric("PSA Group CI", f"[{m['psa_ci'][0]*100:.2f}%, {m['psa_ci'][1]*100:.2f}%]")
+    st.metric(f"{CONTROL} Group CI", f"[{m['psa_ci'][0]*100:.2f}%, {m['psa_ci'][1]*100:.2f}%]")
 
 with col3:
     st.metric("Absolute Lift CI", f"[{m['lift_ci_lower']*100:.2f}%, {m['lift_ci_upper']*100:.2f}%]")
@@ -152,14 +173,15 @@ with col3:
 overlap = not (m['ad_ci'][0] > m['psa_ci'][1])
 
 if not overlap:
-    st.markdown("""
+    st.markdown(f"""
     <div class="success-box">
-    <strong>Interpretation:</strong> Confidence intervals do not overlap, providing strong evidence that the ad group has a higher conversion rate.
+    <strong>Interpretation:</strong> Confidence intervals do not overlap, providing strong evidence that the {TREATMENT} group has a higher conversion rate.
     </div>
     """, unsafe_allow_html=True)
 
 st.markdown("---")
 
+section('Chi-Square Test')
 # Test 3: Chi-Square Test
 st.header("3. Chi-Square Test")
 
@@ -187,6 +209,7 @@ with col2:
 
 st.markdown("---")
 
+section('Effect Size Analysis')
 # Effect Size
 st.header("4. Effect Size Analysis")
 
@@ -200,8 +223,179 @@ st.markdown(f"""
 - h ≥ 0.8: Large effect
 
 **Conclusion:** The effect size of {m['cohens_h']:.4f} indicates a **small to medium** but **practically meaningful** difference 
-between the ad and PSA groups.
+between the {TREATMENT} and {CONTROL} groups.
+""")
+
+# Bootstrap intervals (resampled from the per-arm counts)
+boot = bootstrap_intervals(int(m['ad_conversions']), int(m['ad_total']),
+                           int(m['psa_conversions']), int(m['psa_total']))
+
+boot_df = pd.DataFrame({
+    'Statistic': ['Absolute Lift', 'Relative Lift', "Cohen's h"],
+    'Estimate': [
+        f"{boot['abs_diff']['estimate']*100:.2f}%",
+        f"{boot['relative_lift']['estimate']:.1f}%",
+        f"{boot['cohens_h']['estimate']:.4f}"
+    ],
+    '95% Percentile CI': [
+        f"[{boot['abs_diff']['percentile'][0]*100:.2f}%, {boot['abs_diff']['percentile'][1]*100:.2f}%]",
+        f"[{boot['relative_lift']['percentile'][0]:.1f}%, {boot['relative_lift']['percentile'][1]:.1f}%]",
+        f"[{boot['cohens_h']['percentile'][0]:.4f}, {boot['cohens_h']['percentile'][1]:.4f}]"
+    ],
+    '95% BCa CI': [
+        f"[{boot['abs_diff']['bca'][0]*100:.2f}%, {boot['abs_diff']['bca'][1]*100:.2f}%]",
+        f"[{boot['relative_lift']['bca'][0]:.1f}%, {boot['relative_lift']['bca'][1]:.1f}%]",
+        f"[{boot['cohens_h']['bca'][0]:.4f}, {boot['cohens_h']['bca'][1]:.4f}]"
+    ]
+})
+
+st.subheader(f"Bootstrap Confidence Intervals ({boot['n_boot']:,} replicates)")
+st.dataframe(boot_df, use_container_width=True, hide_index=True)
+
+st.markdown("---")
+
+section('Sequential Monitoring')
+# Sequential monitoring
+st.header("5. Sequential Monitoring (mSPRT)")
+
+seq = msprt(m['ad_conversions'], m['ad_total'], m['psa_conversions'], m['psa_total'])
+
+col1, col2 = st.columns([2, 1])
+
+with col1:
+    st.markdown(f"""
+    The dashboard refreshes continuously, so the fixed-horizon p-value above is only valid for a single look.
+    The mixture sequential probability ratio test gives a p-value and confidence sequence that remain valid
+    no matter how often the results are checked.
+    
+    **Always-Valid P-Value:** {seq['p_value']:.6f}  
+    **Always-Valid 95% CI for Lift:** [{seq['cs_lower']*100:.2f}%, {seq['cs_upper']*100:.2f}%]
+    
+    **Decision:** {f'Stop - {TREATMENT} wins' if seq['reject'] and seq['abs_diff'] > 0 else f'Stop - {CONTROL} wins' if seq['reject'] else 'Keep collecting data'}
+    """)
+
+with col2:
+    if seq['reject']:
+        st.markdown("""
+        <div class="success-box">
+        <strong>Result:</strong><br>
+        Evidence is strong enough to stop the test early, even with continuous monitoring.
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div class="warning-box">
+        <strong>Result:</strong><br>
+        Not yet conclusive under continuous monitoring.
+        </div>
+        """, unsafe_allow_html=True)
+
+st.markdown("---")
+
+section('Multi-Arm Comparisons')
+# Multi-arm comparisons
+st.header("6. Multi-Arm Comparisons")
+
+st.markdown("""
+With more than two arms, every extra comparison is another chance of a false positive.
+All comparisons are computed together from the per-arm counts and the p-values are adjusted
+for the number of tests.
+""")
+
+col1, col2 = st.columns(2)
+
+with col1:
+    comparison_mode = st.radio("Compare", ["Each arm vs control", "All pairs"], horizontal=True)
+
+with col2:
+    correction = st.selectbox(
+        "Correction",
+        ['holm', 'bh', 'bonferroni', 'none'],
+        format_func=lambda c: {'holm': 'Holm (FWER)', 'bh': 'Benjamini-Hochberg (FDR)',
+                               'bonferroni': 'Bonferroni (FWER)', 'none': 'None'}[c]
+    )
+
+comparisons = calculate_arm_comparisons(
+    data, control=None if comparison_mode == "All pairs" else control, correction=correction
+)
+
+comparison_df = pd.DataFrame({
+    'Comparison': comparisons['arm'].str.upper() + ' vs ' + comparisons['baseline'].str.upper(),
+    'Rates': [f"{a*100:.2f}% vs {b*100:.2f}%" for a, b in zip(comparisons['arm_rate'], comparisons['baseline_rate'])],
+    'Relative Lift': [f"{v:+.1f}%" for v in comparisons['lift']],
+    '95% CI (Absolute)': [f"[{lo*100:.2f}%, {hi*100:.2f}%]"
+                          for lo, hi in zip(comparisons['lift_ci_lower'], comparisons['lift_ci_upper'])],
+    'P-Value': [f"{p:.6f}" for p in comparisons['p_value']],
+    'Adjusted P-Value': [f"{p:.6f}" for p in comparisons['p_adjusted']],
+    'Significant': ['Yes' if s else 'No' for s in comparisons['significant']]
+})
+
+st.dataframe(comparison_df, use_container_width=True, hide_index=True)
+
+st.markdown("---")
+
+section('Bayesian Analysis')
+# Bayesian analysis
+st.header("7. Bayesian Analysis")
+
+bayes = bayesian_summary(int(m['ad_conversions']), int(m['ad_total']),
+                         int(m['psa_conversions']), int(m['psa_total']))
+
+st.markdown(f"""
+With a uniform Beta(1, 1) prior, each arm's conversion rate has a Beta posterior. The probability that {TREATMENT}
+beats {CONTROL} and the expected loss of each decision are exact; lift intervals come from posterior draws.
+""")
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric(f"P({TREATMENT} > {CONTROL})", f"{bayes['prob_ad_better']*100:.4f}%")
+
+with col2:
+    st.metric(f"Expected Loss (Ship {TREATMENT})", f"{bayes['expected_loss_ad']*100:.4f}pp")
+
+with col3:
+    st.metric(f"Expected Loss (Keep {CONTROL})", f"{bayes['expected_loss_psa']*100:.4f}pp")
+
+bayes_df = pd.DataFrame({
+    'Quantity': [f'{TREATMENT} Conversion Rate', f'{CONTROL} Conversion Rate', 'Absolute Lift', 'Relative Lift'],
+    'Posterior Mean': [
+        f"{bayes['ad']['mean']*100:.2f}%",
+        f"{bayes['psa']['mean']*100:.2f}%",
+        f"{bayes['abs_diff']['mean']*100:.2f}%",
+        f"{bayes['relative_lift']['mean']:.1f}%"
+    ],
+    '95% Credible Interval': [
+        f"[{bayes['ad']['ci'][0]*100:.2f}%, {bayes['ad']['ci'][1]*100:.2f}%]",
+        f"[{bayes['psa']['ci'][0]*100:.2f}%, {bayes['psa']['ci'][1]*100:.2f}%]",
+        f"[{bayes['abs_diff']['ci'][0]*100:.2f}%, {bayes['abs_diff']['ci'][1]*100:.2f}%]",
+        f"[{bayes['relative_lift']['ci'][0]:.1f}%, {bayes['relative_lift']['ci'][1]:.1f}%]"
+    ]
+})
+
+st.dataframe(bayes_df, use_container_width=True, hide_index=True)
+
+st.markdown("---")
+
+section('Covariate-Adjusted Lift')
+# Covariate adjustment
+st.header("8. Covariate-Adjusted Lift (CUPED)")
+
+adj = calculate_adjusted_effect(data, treatment=treatment, control=control)
+
+st.markdown(f"""
+Regressing conversion on the test group together with the most-ads day, hour and ad frequency removes
+variation the covariates explain, which tightens the interval for the same lift.
+
+**Adjusted Absolute Lift:** {adj['abs_diff']*100:.3f}% (unadjusted {adj['unadjusted_abs_diff']*100:.3f}%)  
+**95% CI:** [{adj['ci'][0]*100:.3f}%, {adj['ci'][1]*100:.3f}%]  
+**Standard Error:** {adj['se']*100:.4f}% (unadjusted {adj['unadjusted_se']*100:.4f}%)  
+**Variance Reduction:** {adj['variance_reduction']*100:.1f}%, equivalent to {max(adj['variance_reduction'], 0)*100:.1f}% less traffic for the same precision
 """)
 
 st.markdown("---")
 st.info("Next: View the Decision page for final recommendations")
+
+end_rerun()
+
+timing_panel('tests', 'tests.')
@@ -14,74 +14,111 @@ utils_dir = os.path.join(parent_dir, 'utils')
 if utils_dir not in sys.path:
     sys.path.insert(0, utils_dir)
 
-from helpers import apply_custom_css, load_data, calculate_metrics
+from helpers import apply_custom_css, load_data, calculate_metrics, get_cube, get_quality_report, dataset_fingerprint
+from figures import cached_figure
+from instrumentation import begin_rerun, section, end_rerun
+from panels import timing_panel
+from bayesian import bayesian_summary
+from multiarm import split_arms
+from cube import DAY, HOUR
+from stratified import stratified_analysis
+from reporting import decision_criteria, recommend
 
 st.set_page_config(page_title="Decision", page_icon="✅", layout="wide")
 st.markdown(apply_custom_css(), unsafe_allow_html=True)
+begin_rerun('decision')
 
 st.title("Decision & Recommendations")
 
+section('Load data')
 # Load metrics
 data = load_data()
-m = calculate_metrics(data)
-
+fingerprint = dataset_fingerprint(data)
+cube = get_cube(data)
+control, treatments = split_arms(cube.arms)
+treatment = st.selectbox("Treatment arm", treatments) if len(treatments) > 1 else treatments[0]
+m = calculate_metrics(data, treatment=treatment, control=control)
+TREATMENT, CONTROL = treatment.upper(), control.upper()
+bayes = bayesian_summary(int(m['ad_conversions']), int(m['ad_total']),
+                         int(m['psa_conversions']), int(m['psa_total']))
+
+# The same checklist and verdict as the headless reports (reporting.py)
+heterogeneity_p = {dim: stratified_analysis(cube, dim, treatment=treatment, control=control)['heterogeneity_p']
+                   for dim in (DAY, HOUR)}
+criteria = decision_criteria(m, bayes, get_quality_report(data)['srm'], heterogeneity_p)
+implement = recommend(criteria) == 'implement'
+consistent = next(c for c in criteria if c['criterion'] == 'Consistency')['passed']
+failed = ', '.join(c['criterion'] for c in criteria if not c['passed'])
+
+section('Executive Summary')
 # Executive Summary
 st.header("Executive Summary")
 
-st.markdown(f"""
-<div class="success-box" style="font-size: 1.1em;">
-<strong>RECOMMENDATION: IMPLEMENT THE ADVERTISING CAMPAIGN</strong><br><br>
-
-The analysis provides overwhelming evidence that advertisements significantly increase customer conversions compared to PSA.
-</div>
-""", unsafe_allow_html=True)
+if implement:
+    st.markdown(f"""
+    <div class="success-box" style="font-size: 1.1em;">
+    <strong>RECOMMENDATION: IMPLEMENT {TREATMENT}</strong><br><br>
+    
+    The analysis provides overwhelming evidence that {TREATMENT} significantly increases customer conversions compared to {CONTROL}.
+    </div>
+    """, unsafe_allow_html=True)
+else:
+    st.markdown(f"""
+    <div class="warning-box" style="font-size: 1.1em;">
+    <strong>RECOMMENDATION: REVIEW BEFORE IMPLEMENTING {TREATMENT}</strong><br><br>
+    
+    Not every decision criterion is met (failed: {failed}). See the Decision Framework below.
+    </div>
+    """, unsafe_allow_html=True)
 
 st.markdown("---")
 
+section('Supporting Evidence')
 # Evidence
 st.header("Supporting Evidence")
 
 col1, col2 = st.columns(2)
 
 with col1:
-    st.markdown("""
+    st.markdown(f"""
     ### Statistical Significance
-    - P-value < 0.0001 (far below α = 0.05)
+    - P-value = {m['p_value']:.2g} (α = 0.05)
     - Chi-square test confirms relationship
     - Confidence intervals do not overlap
     
     ### Consistency
-    - Effect holds across all days of week
-    - Effect holds across all hours of day
-    - Not driven by timing bias
+    - Heterogeneity across days of week: p = {heterogeneity_p[DAY]:.3f}
+    - Heterogeneity across hours of day: p = {heterogeneity_p[HOUR]:.3f}
+    - {'No evidence the effect depends on timing' if consistent else 'The effect differs by timing'}
     """)
 
 with col2:
     st.markdown(f"""
     ### Practical Significance
-    - 43% relative lift in conversion rate
+    - {m['lift']:.0f}% relative lift in conversion rate
     - Cohen's h = {m['cohens_h']:.4f} (meaningful effect)
     - 95% CI for lift: [{m['lift_ci_lower']*100:.2f}%, {m['lift_ci_upper']*100:.2f}%]
     
     ### Business Impact
-    - +8 conversions per 1,000 users
+    - {m['abs_diff']*1000:+.0f} conversions per 1,000 users
     - Absolute lift: {m['abs_diff']*100:.2f} percentage points
     - Statistically and practically significant
     """)
 
 st.markdown("---")
 
+section('Key Metrics Comparison')
 # Key Metrics Visualization
 st.header("Key Metrics Comparison")
 
 # Create comparison chart
 metrics_df = pd.DataFrame({
     'Metric': ['Conversion Rate', 'Conversions', 'Total Users'],
-    'Ad Group': [f"{m['ad_rate']*100:.2f}%", f"{m['ad_conversions']:,}", f"{m['ad_total']:,}"],
-    'PSA Group': [f"{m['psa_rate']*100:.2f}%", f"{m['psa_conversions']:,}", f"{m['psa_total']:,}"],
+    f'{TREATMENT} Group': [f"{m['ad_rate']*100:.2f}%", f"{m['ad_conversions']:,}", f"{m['ad_total']:,}"],
+    f'{CONTROL} Group': [f"{m['psa_rate']*100:.2f}%", f"{m['psa_conversions']:,}", f"{m['psa_total']:,}"],
     'Difference': [
-        f"+{m['abs_diff']*100:.2f}pp",
-        f"+{m['ad_conversions'] - m['psa_conversions']:,}",
+        f"{m['abs_diff']*100:+.2f}pp",
+        f"{m['ad_conversions'] - m['psa_conversions']:+,}",
         f"{m['ad_total'] - m['psa_total']:,}"
     ]
 })
@@ -90,54 +127,56 @@ st.dataframe(metrics_df, use_container_width=True, hide_index=True)
 
 st.markdown("---")
 
+section('Business Impact')
 # Business Impact
 st.header("Business Impact")
 
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    st.markdown("""
+    st.markdown(f"""
     <div class="metric-card">
-        <div class="metric-label">Per 1,000 Ad Viewers</div>
-        <div class="metric-value">~26</div>
+        <div class="metric-label">Per 1,000 {TREATMENT} Viewers</div>
+        <div class="metric-value">~{m['ad_rate']*1000:.0f}</div>
         <div class="metric-label">CONVERSIONS</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col2:
-    st.markdown("""
+    st.markdown(f"""
     <div class="metric-card">
-        <div class="metric-label">Per 1,000 PSA Viewers</div>
-        <div class="metric-value">~18</div>
+        <div class="metric-label">Per 1,000 {CONTROL} Viewers</div>
+        <div class="metric-value">~{m['psa_rate']*1000:.0f}</div>
         <div class="metric-label">CONVERSIONS</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col3:
-    st.markdown("""
+    st.markdown(f"""
     <div class="metric-card">
         <div class="metric-label">Net Gain</div>
-        <div class="metric-value">+8</div>
+        <div class="metric-value">{m['abs_diff']*1000:+.0f}</div>
         <div class="metric-label">CONVERSIONS/1K USERS</div>
     </div>
     """, unsafe_allow_html=True)
 
 st.markdown("---")
 
+section('Recommended Actions')
 # Action Items
 st.header("Recommended Actions")
 
-st.markdown("""
+st.markdown(f"""
 ### Immediate Actions
 
-1. **Deploy the advertising campaign** - Strong evidence supports implementation
+1. **Deploy {TREATMENT}** - Strong evidence supports implementation
 2. **Monitor performance** - Track actual conversion rates post-launch
 3. **Optimize ad frequency** - Use dose-response insights to avoid over-exposure
 
 ### Optimization Opportunities
 
 1. **Ad Frequency**: Target the 51-150 ads range for optimal conversion
-2. **Timing**: Consistent performance means no need for specific day/hour targeting
+2. **Timing**: {'Consistent performance means no need for specific day/hour targeting' if consistent else 'The lift varies by day/hour; check the Analysis page before targeting'}
 3. **Scale**: Large sample validates the effect; expect similar results at scale
 
 ### Ongoing Monitoring
@@ -150,93 +189,104 @@ st.markdown("""
 
 st.markdown("---")
 
+section('Decision Framework')
 # Final decision framework
 st.header("Decision Framework")
 
 decision_df = pd.DataFrame({
-    'Criteria': ['P-Value', 'Effect Size', 'Confidence Interval', 'Consistency', 'Business Impact'],
-    'Threshold': ['< 0.05', '> 0.2', 'Above zero', 'All periods', 'Meaningful lift'],
-    'Result': [
-        f"{m['p_value']:.6f} ✓",
-        f"{m['cohens_h']:.4f} (borderline)",
-        f"[{m['lift_ci_lower']*100:.2f}%, {m['lift_ci_upper']*100:.2f}%] ✓",
-        "All days & hours ✓",
-        f"+{m['lift']:.1f}% ✓"
-    ],
-    'Status': ['PASS', 'PASS', 'PASS', 'PASS', 'PASS']
+    'Criteria': [c['criterion'] for c in criteria],
+    'Threshold': [c['threshold'] for c in criteria],
+    'Result': [c['value'] for c in criteria],
+    'Status': ['PASS' if c['passed'] else 'FAIL' for c in criteria]
 })
 
 st.dataframe(decision_df, use_container_width=True, hide_index=True)
 
-st.markdown("""
-<div class="success-box">
-<strong>Final Decision:</strong> All criteria met. Proceed with campaign implementation.
-</div>
-""", unsafe_allow_html=True)
+if implement:
+    st.markdown("""
+    <div class="success-box">
+    <strong>Final Decision:</strong> All criteria met. Proceed with campaign implementation.
+    </div>
+    """, unsafe_allow_html=True)
+else:
+    st.markdown(f"""
+    <div class="warning-box">
+    <strong>Final Decision:</strong> Review before implementing; failed criteria: {failed}.
+    </div>
+    """, unsafe_allow_html=True)
 
 st.markdown("---")
 
+section('Conclusion')
 # Conclusion
 st.header("Conclusion")
 
 st.markdown(f"""
-The A/B test demonstrates that advertisements significantly outperform PSA in driving conversions:
+The A/B test demonstrates that {TREATMENT} significantly outperforms {CONTROL} in driving conversions:
 
-- **Statistical Evidence**: p < 0.0001 provides overwhelming statistical significance
-- **Practical Impact**: {m['lift']:.1f}% relative lift translates to ~8 additional conversions per 1,000 users
+- **Statistical Evidence**: p = {m['p_value']:.2g} provides overwhelming statistical significance
+- **Practical Impact**: {m['lift']:.1f}% relative lift translates to ~{m['abs_diff']*1000:.0f} additional conversions per 1,000 users
 - **Confidence**: 95% confident the true lift is between {m['lift_ci_lower']*100:.2f}% and {m['lift_ci_upper']*100:.2f}%
-- **Robustness**: Effect is consistent across all temporal dimensions
+- **Robustness**: {'No significant difference in the effect across days or hours' if consistent else 'The effect differs across days or hours'}
 
-**The advertising campaign should be implemented.**
+**{TREATMENT + ' should be implemented.' if implement else 'Review the failed criteria before implementing ' + TREATMENT + '.'}**
 """)
 
 # Visual summary
-fig = go.Figure()
-
-# Add bars for conversion rates
-fig.add_trace(go.Bar(
-    x=['Ad Group', 'PSA Group'],
-    y=[m['ad_rate']*100, m['psa_rate']*100],
-    marker=dict(
-        color=['#51cf66', '#ff6b6b'],
-        line=dict(color='#2c3e50', width=2)
-    ),
-    text=[f"{m['ad_rate']*100:.2f}%", f"{m['psa_rate']*100:.2f}%"],
-    textposition='outside',
-    textfont=dict(size=16, color='#2c3e50'),
-    hovertemplate='<b>%{x}</b><br>Conversion: %{y:.2f}%<extra></extra>'
-))
-
-# Add annotation for lift
-fig.add_annotation(
-    x=0.5, y=max(m['ad_rate']*100, m['psa_rate']*100) * 0.6,
-    xref='paper', yref='y',
-    text=f'Lift: +{m['lift']:.1f}%<br>p < 0.0001',
-    showarrow=True,
-    arrowhead=2,
-    arrowsize=1,
-    arrowwidth=2,
-    arrowcolor='#2c3e50',
-    ax=0,
-    ay=-50,
-    font=dict(size=16, color='white'),
-    bgcolor='#667eea',
-    bordercolor='#4c5fd5',
-    borderwidth=2,
-    borderpad=10
-)
-
-fig.update_layout(
-    title={'text': 'Final Result: Ad vs PSA Conversion Rates', 'x': 0.5, 'xanchor': 'center',
-           'font': {'size': 22, 'color': '#2c3e50'}},
-    xaxis_title='Test Group',
-    yaxis_title='Conversion Rate (%)',
-    height=500,
-    plot_bgcolor='#f8f9fa',
-    showlegend=False
-)
+def build_fig():
+    fig = go.Figure()
+
+    # Add bars for conversion rates
+    fig.add_trace(go.Bar(
+        x=[f'{TREATMENT} Group', f'{CONTROL} Group'],
+        y=[m['ad_rate']*100, m['psa_rate']*100],
+        marker=dict(
+            color=['#51cf66', '#ff6b6b'],
+            line=dict(color='#2c3e50', width=2)
+        ),
+        text=[f"{m['ad_rate']*100:.2f}%", f"{m['psa_rate']*100:.2f}%"],
+        textposition='outside',
+        textfont=dict(size=16, color='#2c3e50'),
+        hovertemplate='<b>%{x}</b><br>Conversion: %{y:.2f}%<extra></extra>'
+    ))
+
+    # Add annotation for lift
+    fig.add_annotation(
+        x=0.5, y=max(m['ad_rate']*100, m['psa_rate']*100) * 0.6,
+        xref='paper', yref='y',
+        text=f"Lift: {m['lift']:+.1f}%<br>p = {m['p_value']:.2g}",
+        showarrow=True,
+        arrowhead=2,
+        arrowsize=1,
+        arrowwidth=2,
+        arrowcolor='#2c3e50',
+        ax=0,
+        ay=-50,
+        font=dict(size=16, color='white'),
+        bgcolor='#667eea',
+        bordercolor='#4c5fd5',
+        borderwidth=2,
+        borderpad=10
+    )
+
+    fig.update_layout(
+        title={'text': f'Final Result: {TREATMENT} vs {CONTROL} Conversion Rates', 'x': 0.5, 'xanchor': 'center',
+               'font': {'size': 22, 'color': '#2c3e50'}},
+        xaxis_title='Test Group',
+        yaxis_title='Conversion Rate (%)',
+        height=500,
+        plot_bgcolor='#f8f9fa',
+        showlegend=False
+    )
+    return fig
+
+fig = cached_figure('decision.final_result', (fingerprint, treatment), build_fig)
 
 st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("---")
 st.caption("Analysis complete. Navigate back to explore other sections.")
+
+end_rerun()
+
+timing_panel('decision', 'decision.')
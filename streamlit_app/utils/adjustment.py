@@ -0,0 +1,97 @@
+"""
+Covariate-adjusted lift (regression adjustment / CUPED)
+
+Conversion varies a lot with ad frequency and timing, and that noise widens
+the plain difference-in-means interval. Regressing ``converted`` on the arm
+indicator plus ``most ads day``, ``most ads hour`` and binned ``total ads``
+(OLS with heteroskedasticity-robust standard errors) removes the explained
+part. The arm coefficient is still an unbiased estimate of the lift under
+randomization, with a smaller variance. This is the multi-covariate form of
+CUPED.
+
+All covariates are cube dimensions, so each cell of the ``SegmentCube``
+stands for rows sharing one design row. X'WX, X'y and the robust "meat"
+are exact weighted sums over the cells, and the fit costs O(cells) whatever
+the row count.
+
+The covariates must not be affected by the treatment. That holds here
+because both arms are served the same number of impressions; it would not
+hold for a metric that ads can change.
+"""
+import numpy as np
+from scipy import stats
+
+from multiarm import TREATMENT_ARM, CONTROL_ARM
+
+COVARIATES = ('day', 'hour', 'exposure')
+_AXES = {'day': 1, 'hour': 2, 'exposure': 3}
+
+
+def _one_hot(codes, n_levels):
+    """Dummy columns for every observed level except the first (the reference)"""
+    observed = np.flatnonzero(np.bincount(codes, minlength=n_levels))
+    return (codes[:, None] == observed[None, 1:]).astype(np.float64)
+
+
+def _cells(cube, treatment, control):
+    """Non-empty (treatment/control) cells as coordinate arrays plus their counts"""
+    arms = [cube.arms.index(treatment), cube.arms.index(control)]
+    users = cube.users[arms]
+    coords = np.nonzero(users)
+    return coords, users[coords].astype(np.float64), cube.conversions[arms][coords].astype(np.float64)
+
+
+def _robust_fit(X, n, y_sum):
+    """Weighted OLS on cell rows with HC1 covariance; y is binary within each cell"""
+    bread = np.linalg.pinv(X.T @ (X * n[:, None]))
+    beta = bread @ (X.T @ y_sum)
+    fitted = X @ beta
+    # Sum of squared residuals per cell: y_sum ones and (n - y_sum) zeros around ``fitted``
+    residual_ss = y_sum * (1 - fitted) ** 2 + (n - y_sum) * fitted ** 2
+    meat = X.T @ (X * residual_ss[:, None])
+    total, params = n.sum(), X.shape[1]
+    cov = bread @ meat @ bread * total / (total - params)
+    return beta, cov, residual_ss.sum()
+
+
+def adjusted_effect(cube, treatment=TREATMENT_ARM, control=CONTROL_ARM, covariates=COVARIATES, alpha=0.05):
+    """Regression-adjusted absolute and relative lift of ``treatment`` over ``control``
+
+    Returns the adjusted and unadjusted estimates side by side with their
+    standard errors, the two-sided z-test and CI for the adjusted lift, and
+    ``variance_reduction`` (1 - adjusted variance / unadjusted variance).
+    """
+    (arm, *coords), n, y_sum = _cells(cube, treatment, control)
+    is_treated = (arm == 0).astype(np.float64)[:, None]
+    intercept = np.ones_like(is_treated)
+
+    base = np.hstack([intercept, is_treated])
+    design = np.hstack([base] + [_one_hot(coords[_AXES[c] - 1], cube.shape[_AXES[c]]) for c in covariates])
+
+    beta_raw, cov_raw, _ = _robust_fit(base, n, y_sum)
+    beta, cov, residual_ss = _robust_fit(design, n, y_sum)
+
+    rate = y_sum.sum() / n.sum()
+    total_ss = y_sum.sum() * (1 - rate) ** 2 + (n.sum() - y_sum.sum()) * rate ** 2
+
+    # Lift relative to the control mean (which the regression leaves unchanged)
+    control_rate = y_sum[arm == 1].sum() / n[arm == 1].sum()
+    abs_diff, se = beta[1], np.sqrt(cov[1, 1])
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+
+    return {
+        'abs_diff': float(abs_diff),
+        'se': float(se),
+        'ci': (float(abs_diff - z_crit * se), float(abs_diff + z_crit * se)),
+        'lift': float(abs_diff / control_rate * 100),
+        'lift_ci': (float((abs_diff - z_crit * se) / control_rate * 100),
+                    float((abs_diff + z_crit * se) / control_rate * 100)),
+        'z_stat': float(abs_diff / se),
+        'p_value': float(2 * stats.norm.sf(abs(abs_diff / se))),
+        'unadjusted_abs_diff': float(beta_raw[1]),
+        'unadjusted_se': float(np.sqrt(cov_raw[1, 1])),
+        'variance_reduction': float(1 - cov[1, 1] / cov_raw[1, 1]),
+        'r_squared': float(1 - residual_ss / total_ss),
+        'covariates': list(covariates),
+        'parameters': design.shape[1],
+    }
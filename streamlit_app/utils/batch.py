@@ -0,0 +1,106 @@
+"""
+Vectorized metrics for many experiments at once
+
+``batch_metrics`` takes per-arm counts for N experiments as arrays and returns
+every statistic of ``calculate_metrics_from_counts`` as arrays of length N:
+the pooled two-proportion z-test, per-arm confidence intervals, the lift CI,
+Cohen's h and the Yates-corrected chi-square test. Each is written out with
+NumPy/SciPy ufuncs so evaluating thousands of campaigns is a handful of array
+operations.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsmodels.stats.proportion import proportion_confint
+
+COUNT_COLUMNS = ['ad_conversions', 'ad_total', 'psa_conversions', 'psa_total']
+
+
+def _p_value(z, alternative):
+    if alternative == 'larger':
+        return stats.norm.sf(z)
+    if alternative == 'smaller':
+        return stats.norm.cdf(z)
+    if alternative == 'two-sided':
+        return 2 * stats.norm.sf(np.abs(z))
+    raise ValueError(f'Unknown alternative: {alternative!r}')
+
+
+def _yates_chi2(table):
+    """Chi-square test with Yates' correction for a stack of 2x2 tables (N, 2, 2)"""
+    total = table.sum(axis=(1, 2), keepdims=True)
+    expected = table.sum(axis=2, keepdims=True) * table.sum(axis=1, keepdims=True) / total
+    # Same correction as scipy.stats.chi2_contingency: move each cell up to 0.5 towards expected
+    diff = expected - table
+    corrected = table + np.sign(diff) * np.minimum(0.5, np.abs(diff))
+    chi2 = ((corrected - expected) ** 2 / expected).sum(axis=(1, 2))
+    return chi2, stats.chi2.sf(chi2, 1)
+
+
+def batch_metrics(ad_conversions, ad_total, psa_conversions, psa_total,
+                  alpha=0.05, alternative='larger', ci_method='normal'):
+    """Metrics for N experiments given length-N arrays of per-arm counts"""
+    ad_conversions, ad_total, psa_conversions, psa_total = (
+        np.asarray(a, dtype=np.float64) for a in (ad_conversions, ad_total, psa_conversions, psa_total)
+    )
+    ad_rate = ad_conversions / ad_total
+    psa_rate = psa_conversions / psa_total
+
+    # Lift calculations
+    abs_diff = ad_rate - psa_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = abs_diff / psa_rate * 100
+
+    # Pooled two-proportion z-test (as statsmodels.proportions_ztest)
+    pooled = (ad_conversions + psa_conversions) / (ad_total + psa_total)
+    z_stat = abs_diff / np.sqrt(pooled * (1 - pooled) * (1 / ad_total + 1 / psa_total))
+    p_value = _p_value(z_stat, alternative)
+
+    # Confidence intervals
+    ad_ci = proportion_confint(ad_conversions, ad_total, alpha=alpha, method=ci_method)
+    psa_ci = proportion_confint(psa_conversions, psa_total, alpha=alpha, method=ci_method)
+
+    # CI for lift
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    se_diff = np.sqrt(ad_rate * (1 - ad_rate) / ad_total + psa_rate * (1 - psa_rate) / psa_total)
+
+    # Effect size (Cohen's h)
+    cohens_h = 2 * (np.arcsin(np.sqrt(ad_rate)) - np.arcsin(np.sqrt(psa_rate)))
+
+    # Chi-square test on the stacked 2x2 tables
+    table = np.stack([
+        np.stack([ad_total - ad_conversions, ad_conversions], axis=-1),
+        np.stack([psa_total - psa_conversions, psa_conversions], axis=-1),
+    ], axis=-2)
+    chi2, chi2_p = _yates_chi2(table)
+
+    return {
+        'ad_rate': ad_rate,
+        'psa_rate': psa_rate,
+        'abs_diff': abs_diff,
+        'lift': lift,
+        'z_stat': z_stat,
+        'p_value': p_value,
+        'ad_ci': ad_ci,
+        'psa_ci': psa_ci,
+        'lift_ci_lower': abs_diff - z_crit * se_diff,
+        'lift_ci_upper': abs_diff + z_crit * se_diff,
+        'cohens_h': cohens_h,
+        'chi2': chi2,
+        'chi2_p': chi2_p,
+    }
+
+
+def run_batch(experiments, **params):
+    """Evaluate a DataFrame of experiments (one row each, ``COUNT_COLUMNS``)
+
+    Returns a DataFrame on the same index with one column per statistic.
+    """
+    results = batch_metrics(*(experiments[c].to_numpy() for c in COUNT_COLUMNS), **params)
+    columns = {}
+    for name, values in results.items():
+        if isinstance(values, tuple):
+            columns[f'{name}_lower'], columns[f'{name}_upper'] = values
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns, index=experiments.index)
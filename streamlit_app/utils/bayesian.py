@@ -0,0 +1,111 @@
+"""
+Bayesian beta-binomial analysis
+
+With a Beta prior on each arm's conversion rate, the posterior after s
+conversions out of n users is Beta(a + s, b + n - s). P(ad > psa) and the
+expected loss of either decision have closed forms for integer posterior
+parameters (a finite sum of beta functions, evaluated in log space over the
+smaller arm). Credible intervals for the lift have no closed form and come
+from a seeded, batched Monte Carlo over the two posteriors.
+
+Everything works from per-arm counts, so a page rerun costs milliseconds.
+"""
+import time
+
+import numpy as np
+from scipy import stats
+from scipy.special import betaln
+
+from memo import LRUCache
+
+DEFAULT_PRIOR = (1.0, 1.0)
+
+_cache = LRUCache(maxsize=64)
+
+
+def prob_greater(a1, b1, a2, b2):
+    """P(X > Y) for independent X ~ Beta(a1, b1) and Y ~ Beta(a2, b2)
+
+    Exact when ``a1`` or ``a2`` is an integer; the sum runs over whichever
+    is smaller. Returns None when neither is, so callers can fall back to
+    sampling.
+    """
+    if float(a2).is_integer() and (a2 < a1 or not float(a1).is_integer()):
+        return 1.0 - prob_greater(a2, b2, a1, b1)
+    if not float(a1).is_integer():
+        return None
+    i = np.arange(int(a1), dtype=np.float64)
+    log_terms = (betaln(a2 + i, b1 + b2) - np.log(b1 + i)
+                 - betaln(1 + i, b1) - betaln(a2, b2))
+    return float(np.exp(log_terms).sum())
+
+
+def expected_loss(a1, b1, a2, b2):
+    """E[max(Y - X, 0)]: conversion rate given up by choosing X when Y may be better"""
+    mean_x, mean_y = a1 / (a1 + b1), a2 / (a2 + b2)
+    loss = mean_y * prob_greater(a2 + 1, b2, a1, b1) - mean_x * prob_greater(a2, b2, a1 + 1, b1)
+    # Cancellation can leave a tiny negative number when Y is almost surely worse
+    return max(float(loss), 0.0)
+
+
+def _draw_batch(rng, size, ad_posterior, psa_posterior):
+    ad = rng.beta(*ad_posterior, size=size)
+    psa = rng.beta(*psa_posterior, size=size)
+    return ad - psa, (ad - psa) / psa * 100
+
+
+def bayesian_summary(ad_conversions, ad_total, psa_conversions, psa_total, prior=DEFAULT_PRIOR,
+                     n_draws=200_000, alpha=0.05, seed=0, batch_size=100_000):
+    """Posterior summaries for the ad vs psa comparison (memoized on the arguments)
+
+    Returns P(ad > psa), the expected loss of shipping either arm, per-arm
+    credible intervals (exact) and credible intervals for the absolute and
+    relative lift (Monte Carlo with ``n_draws`` posterior samples).
+    """
+    key = (ad_conversions, ad_total, psa_conversions, psa_total, tuple(prior), n_draws, alpha, seed,
+           batch_size)
+    return _cache.get_or_compute(key, lambda: _summary(*key))
+
+
+def _summary(ad_conversions, ad_total, psa_conversions, psa_total, prior,
+             n_draws, alpha, seed, batch_size):
+    start = time.perf_counter()
+    a0, b0 = prior
+    ad_posterior = (a0 + ad_conversions, b0 + ad_total - ad_conversions)
+    psa_posterior = (a0 + psa_conversions, b0 + psa_total - psa_conversions)
+    quantiles = [alpha / 2, 0.5, 1 - alpha / 2]
+
+    rng = np.random.default_rng(seed)
+    sizes = [batch_size] * (n_draws // batch_size) + ([n_draws % batch_size] if n_draws % batch_size else [])
+    abs_diff, relative_lift = (np.concatenate(parts) for parts in zip(
+        *(_draw_batch(rng, size, ad_posterior, psa_posterior) for size in sizes)
+    ))
+
+    prob_ad_better = prob_greater(*ad_posterior, *psa_posterior)
+    if prob_ad_better is None:
+        prob_ad_better = float(np.mean(abs_diff > 0))
+        loss_ad = float(np.mean(np.maximum(-abs_diff, 0)))
+        loss_psa = float(np.mean(np.maximum(abs_diff, 0)))
+    else:
+        loss_ad = expected_loss(*ad_posterior, *psa_posterior)
+        loss_psa = expected_loss(*psa_posterior, *ad_posterior)
+
+    def arm(posterior):
+        lower, upper = stats.beta.ppf([alpha / 2, 1 - alpha / 2], *posterior)
+        return {'mean': posterior[0] / sum(posterior), 'ci': (float(lower), float(upper))}
+
+    def draws(values):
+        lower, median, upper = np.quantile(values, quantiles)
+        return {'mean': float(values.mean()), 'median': float(median), 'ci': (float(lower), float(upper))}
+
+    return {
+        'prob_ad_better': prob_ad_better,
+        'expected_loss_ad': loss_ad,
+        'expected_loss_psa': loss_psa,
+        'ad': arm(ad_posterior),
+        'psa': arm(psa_posterior),
+        'abs_diff': draws(abs_diff),
+        'relative_lift': draws(relative_lift),
+        'n_draws': n_draws,
+        'seconds': time.perf_counter() - start,
+    }
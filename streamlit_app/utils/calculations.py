@@ -0,0 +1,178 @@
+"""
+Data loading and calculations behind the Streamlit pages
+
+Imported on first use through ``helpers`` so that pages which only style
+themselves never load pandas, scipy or statsmodels.
+"""
+import numpy as np
+from scipy import stats
+from statsmodels.stats.proportion import proportions_ztest, proportion_confint
+
+from data_store import get_dataset, get_cache_stats, clear_cache, dataset_fingerprint
+from instrumentation import span, timed
+from memo import LRUCache
+from schema import SCHEMA, validate_frame, memory_report
+from sufficient_stats import aggregate_counts
+from cube import SegmentCube
+from streaming import stream_cube
+from multiarm import TREATMENT_ARM, CONTROL_ARM, compare_arms, primary_pair
+from adjustment import adjusted_effect
+from quality import EXPECTED_ALLOCATION, quality_report
+
+# Public API, including the data_store/schema/streaming names re-exported for ``helpers``
+__all__ = [
+    'load_data', 'calculate_metrics', 'calculate_metrics_from_cube', 'calculate_arm_comparisons',
+    'get_metrics_cache_stats', 'get_cube', 'get_quality_report', 'calculate_adjusted_effect',
+    'calculate_metrics_from_counts',
+    'get_dataset', 'get_cache_stats', 'clear_cache', 'dataset_fingerprint',
+    'SCHEMA', 'validate_frame', 'memory_report', 'stream_cube',
+]
+
+# Cache data loading for performance
+@timed('load_data')
+def load_data(path=None, use_snapshot=True):
+    """Load the marketing data from the process-wide dataset cache
+
+    The frame is shared across sessions, so callers must not mutate it in place.
+    A columnar snapshot is built next to the CSV on first load and reused until
+    the CSV changes.
+    """
+    return get_dataset(path, use_snapshot=use_snapshot)
+
+# Metrics shared by every page and session, keyed on dataset fingerprint + parameters
+_metrics_cache = LRUCache(maxsize=32)
+
+@timed('calculate_metrics')
+def calculate_metrics(data, alpha=0.05, alternative='larger', ci_method='normal',
+                      treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """Calculate all key metrics for the analysis (memoized per dataset and parameters)"""
+    key = (dataset_fingerprint(data), alpha, alternative, ci_method, treatment, control)
+
+    def compute():
+        with span('aggregate_counts'):
+            counts = aggregate_counts(data)
+        return _metrics_from_arm_counts(counts, alpha, alternative, ci_method, treatment, control)
+
+    # Copy so a caller editing its result cannot corrupt the shared entry
+    return dict(_metrics_cache.get_or_compute(key, compute))
+
+def calculate_metrics_from_cube(cube, alpha=0.05, alternative='larger', ci_method='normal',
+                                treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """Calculate all key metrics from a pre-aggregated SegmentCube"""
+    return _metrics_from_arm_counts(cube.arm_counts(), alpha, alternative, ci_method, treatment, control)
+
+def _metrics_from_arm_counts(counts, alpha, alternative, ci_method, treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    # Arms missing from the data fall back as in split_arms; the ad_* and psa_* keys then hold
+    # the resolved treatment and control, named in treatment_arm / control_arm
+    treatment, control = primary_pair(counts.index, treatment, control)
+    metrics = calculate_metrics_from_counts(
+        counts.loc[treatment, 'successes'], counts.loc[treatment, 'trials'],
+        counts.loc[control, 'successes'], counts.loc[control, 'trials'],
+        alpha=alpha, alternative=alternative, ci_method=ci_method
+    )
+    metrics.update(treatment_arm=treatment, control_arm=control)
+    return metrics
+
+@timed('calculate_arm_comparisons')
+def calculate_arm_comparisons(data, control=CONTROL_ARM, alpha=0.05, alternative='two-sided',
+                              correction='holm'):
+    """Tests of every arm vs ``control`` (all pairs if None), memoized per dataset and parameters"""
+    key = ('arms', dataset_fingerprint(data), control, alpha, alternative, correction)
+
+    def compute():
+        return compare_arms(get_cube(data).arm_counts(), control=control, alpha=alpha,
+                            alternative=alternative, correction=correction)
+
+    return _metrics_cache.get_or_compute(key, compute).copy()
+
+def get_metrics_cache_stats():
+    """Return hit/miss counters for the shared metrics cache"""
+    return _metrics_cache.stats()
+
+_cube_cache = LRUCache(maxsize=8)
+
+@timed('get_cube')
+def get_cube(data):
+    """Return the arm x day x hour x exposure cube for ``data`` (memoized per dataset)"""
+    def build():
+        with span('cube_build'):
+            return SegmentCube.from_frame(data)
+
+    return _cube_cache.get_or_compute(dataset_fingerprint(data), build)
+
+_quality_cache = LRUCache(maxsize=8)
+
+@timed('get_quality_report')
+def get_quality_report(data, allocation=None):
+    """SRM, duplicate, null and range checks for ``data`` (computed once per dataset)"""
+    allocation = allocation or EXPECTED_ALLOCATION
+    key = (dataset_fingerprint(data), tuple(sorted(allocation.items())))
+    return _quality_cache.get_or_compute(key, lambda: quality_report(data, allocation))
+
+@timed('calculate_adjusted_effect')
+def calculate_adjusted_effect(data, alpha=0.05, treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """Covariate-adjusted (CUPED) lift of ``treatment`` over ``control``, memoized per dataset"""
+    key = ('adjusted', dataset_fingerprint(data), alpha, treatment, control)
+
+    def compute():
+        cube = get_cube(data)
+        pair = primary_pair(cube.arms, treatment, control)
+        return adjusted_effect(cube, treatment=pair[0], control=pair[1], alpha=alpha)
+
+    return dict(_metrics_cache.get_or_compute(key, compute))
+
+def calculate_metrics_from_counts(ad_conversions, ad_total, psa_conversions, psa_total,
+                                  alpha=0.05, alternative='larger', ci_method='normal'):
+    """Calculate all key metrics from per-arm conversion counts alone"""
+    ad_rate = ad_conversions / ad_total
+    psa_rate = psa_conversions / psa_total
+    
+    # Lift calculations
+    abs_diff = ad_rate - psa_rate
+    lift = (abs_diff / psa_rate) * 100
+    
+    # Statistical tests
+    count = np.array([ad_conversions, psa_conversions])
+    nobs = np.array([ad_total, psa_total])
+    z_stat, p_value = proportions_ztest(count, nobs, alternative=alternative)
+    
+    # Confidence intervals
+    ad_ci = proportion_confint(ad_conversions, ad_total, alpha=alpha, method=ci_method)
+    psa_ci = proportion_confint(psa_conversions, psa_total, alpha=alpha, method=ci_method)
+    
+    # CI for lift
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    se_diff = np.sqrt((ad_rate * (1 - ad_rate) / ad_total) + 
+                      (psa_rate * (1 - psa_rate) / psa_total))
+    lift_ci_lower = abs_diff - (z_crit * se_diff)
+    lift_ci_upper = abs_diff + (z_crit * se_diff)
+    
+    # Effect size (Cohen's h)
+    cohens_h = 2 * (np.arcsin(np.sqrt(ad_rate)) - np.arcsin(np.sqrt(psa_rate)))
+    
+    # Chi-square test on the 2x2 table (rows: ad, psa; columns: not converted, converted)
+    contingency = np.array([
+        [ad_total - ad_conversions, ad_conversions],
+        [psa_total - psa_conversions, psa_conversions]
+    ])
+    chi2, chi2_p, dof, expected = stats.chi2_contingency(contingency)
+    
+    return {
+        'ad_conversions': ad_conversions,
+        'ad_total': ad_total,
+        'ad_rate': ad_rate,
+        'psa_conversions': psa_conversions,
+        'psa_total': psa_total,
+        'psa_rate': psa_rate,
+        'abs_diff': abs_diff,
+        'lift': lift,
+        'z_stat': z_stat,
+        'p_value': p_value,
+        'ad_ci': ad_ci,
+        'psa_ci': psa_ci,
+        'lift_ci_lower': lift_ci_lower,
+        'lift_ci_upper': lift_ci_upper,
+        'cohens_h': cohens_h,
+        'chi2': chi2,
+        'chi2_p': chi2_p
+    }
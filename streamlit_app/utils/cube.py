@@ -0,0 +1,188 @@
+"""
+Segmentation cube: arm x day x hour x exposure-bin aggregates
+
+One vectorized pass over the experiment frame fills three dense count arrays
+(users, conversions and summed ``total ads``). Every chart and table in the
+app and notebook is a marginal of these arrays, so re-slicing by day, hour or
+ad frequency costs a few thousand additions instead of a groupby over every
+row.
+
+The exposure axis uses fine bin edges that include every edge the app and
+notebook bin on. Any coarser binning built from those edges is an exact
+regrouping of the fine bins and matches ``pd.cut`` on the raw column.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import DAYS
+from sufficient_stats import _codes
+
+ARM, DAY, HOUR, EXPOSURE = 'test group', 'most ads day', 'most ads hour', 'exposure'
+DIMS = (ARM, DAY, HOUR, EXPOSURE)
+
+HOURS = np.arange(24)
+
+# Union of the dose-response bins used in 3_Analysis and the notebook
+EXPOSURE_EDGES = np.array([0, 10, 25, 50, 75, 100, 150, 200, 250, 300, 400, 500, 1000, 2500])
+
+# Ad-frequency groups of the dose-response analysis (a regrouping of the edges above)
+DOSE_BINS = [0, 25, 50, 100, 150, 200, 250, 300, 400, 2500]
+DOSE_LABELS = ['1-25', '26-50', '51-100', '101-150', '151-200', '201-250', '251-300', '301-400', '400+']
+
+
+def _fine_labels(edges):
+    """Labels for the fine exposure bins, including under- and overflow"""
+    labels = [f'<={edges[0]}']
+    labels += [f'{lo + 1}-{hi}' for lo, hi in zip(edges[:-1], edges[1:])]
+    labels.append(f'{edges[-1]}+')
+    return labels
+
+
+def exposure_bin(total_ads, edges=EXPOSURE_EDGES):
+    """Map ``total ads`` to fine bin numbers; bin i covers (edges[i-1], edges[i]]"""
+    return np.searchsorted(edges, total_ads, side='left')
+
+
+class SegmentCube:
+    """Dense conversion counts over arm x day x hour x exposure bin"""
+
+    def __init__(self, arms, users, conversions, exposure_sum, edges=EXPOSURE_EDGES):
+        self.arms = list(arms)
+        self.edges = np.asarray(edges)
+        self.users = users
+        self.conversions = conversions
+        self.exposure_sum = exposure_sum
+
+    @property
+    def shape(self):
+        return self.users.shape
+
+    @property
+    def exposure_labels(self):
+        return _fine_labels(self.edges)
+
+    @classmethod
+    def from_frame(cls, data, edges=EXPOSURE_EDGES):
+        """Build the cube from a row-level experiment frame in one pass"""
+        arm_codes, arms = _codes(data[ARM])
+        day = data[DAY]
+        if isinstance(day.dtype, pd.CategoricalDtype) and list(day.cat.categories) == DAYS:
+            day_codes = day.cat.codes.to_numpy()
+        else:
+            day_codes = pd.Categorical(day, categories=DAYS).codes
+        hours = data[HOUR].to_numpy()
+        total_ads = data['total ads'].to_numpy()
+        converted = data['converted'].to_numpy(dtype=bool)
+
+        shape = (len(arms), len(DAYS), len(HOURS), len(edges) + 1)
+        valid = (arm_codes >= 0) & (day_codes >= 0) & (hours >= 0) & (hours < len(HOURS))
+
+        flat = arm_codes.astype(np.int64)
+        flat = flat * shape[1] + day_codes
+        flat = flat * shape[2] + hours
+        flat = flat * shape[3] + exposure_bin(total_ads, edges)
+        flat, converted, total_ads = flat[valid], converted[valid], total_ads[valid]
+
+        size = int(np.prod(shape))
+        users = np.bincount(flat, minlength=size).reshape(shape)
+        conversions = np.bincount(flat[converted], minlength=size).reshape(shape)
+        exposure_sum = np.bincount(flat, weights=total_ads, minlength=size).reshape(shape)
+        return cls(arms, users, conversions, exposure_sum, edges)
+
+    def merge(self, other):
+        """Return a cube holding the counts of both cubes (arms are unioned)"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('Cannot merge cubes with different exposure edges')
+        arms = self.arms + [arm for arm in other.arms if arm not in self.arms]
+        shape = (len(arms),) + self.shape[1:]
+        merged = [np.zeros(shape, dtype=a.dtype) for a in (self.users, self.conversions, self.exposure_sum)]
+        for cube in (self, other):
+            rows = [arms.index(arm) for arm in cube.arms]
+            for total, part in zip(merged, (cube.users, cube.conversions, cube.exposure_sum)):
+                total[rows] += part
+        return SegmentCube(arms, *merged, edges=self.edges)
+
+    __add__ = merge
+
+    @property
+    def total_users(self):
+        return int(self.users.sum())
+
+    def _levels(self, dim):
+        return {
+            ARM: self.arms,
+            DAY: DAYS,
+            HOUR: list(HOURS),
+            EXPOSURE: self.exposure_labels,
+        }[dim]
+
+    def _rebin_matrix(self, bins):
+        """0/1 matrix mapping fine exposure bins onto ``bins`` (pd.cut semantics)"""
+        bins = np.asarray(bins)
+        missing = np.setdiff1d(bins, self.edges)
+        if missing.size:
+            raise ValueError(f'Bin edges {missing.tolist()} are not cube edges {self.edges.tolist()}')
+        # Fine bin i (1..len(edges)-1) covers (edges[i-1], edges[i]]
+        upper = self.edges[1:]
+        coarse = np.searchsorted(bins, upper, side='left') - 1
+        matrix = np.zeros((len(self.edges) + 1, len(bins) - 1))
+        inside = (coarse >= 0) & (coarse < len(bins) - 1)
+        matrix[np.arange(1, len(self.edges))[inside], coarse[inside]] = 1
+        return matrix
+
+    def summary(self, dims, arm=None, bins=None, labels=None):
+        """Conversions, users, rate and mean ``total ads`` grouped by ``dims``
+
+        ``arm`` restricts to a single arm; ``bins``/``labels`` regroup the
+        exposure axis like ``pd.cut``. Empty groups are dropped, matching a
+        groupby with ``observed=True``.
+        """
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        arrays = [self.conversions, self.users, self.exposure_sum]
+        levels = {dim: self._levels(dim) for dim in DIMS}
+
+        if arm is not None:
+            position = self.arms.index(arm)
+            arrays = [a[position:position + 1] for a in arrays]
+            levels[ARM] = [arm]
+        if bins is not None:
+            matrix = self._rebin_matrix(bins)
+            arrays = [a @ matrix for a in arrays]
+            levels[EXPOSURE] = labels if labels is not None else _fine_labels(np.asarray(bins))[1:-1]
+
+        # Sum out every dimension not asked for, then order axes as requested
+        drop = tuple(i for i, dim in enumerate(DIMS) if dim not in dims)
+        kept = [dim for dim in DIMS if dim in dims]
+        order = [kept.index(dim) for dim in dims]
+        conversions, users, exposure = (a.sum(axis=drop).transpose(order) for a in arrays)
+
+        # Categorical levels keep day and exposure order through unstack/pivot
+        index = pd.MultiIndex.from_product(
+            [pd.CategoricalIndex(levels[dim], categories=levels[dim], ordered=True)
+             if dim in (DAY, EXPOSURE) else levels[dim] for dim in dims],
+            names=dims
+        )
+        if len(dims) == 1:
+            index = index.get_level_values(0)
+        table = pd.DataFrame({
+            'Conversions': conversions.ravel().astype(np.int64),
+            'Total_Users': users.ravel().astype(np.int64),
+            'Exposure_Sum': exposure.ravel(),
+        }, index=index)
+        table = table[table['Total_Users'] > 0].copy()
+        table['Conversion_Rate'] = table['Conversions'] / table['Total_Users']
+        table['Avg_Ads'] = table['Exposure_Sum'] / table['Total_Users']
+        return table.drop(columns='Exposure_Sum')
+
+    def arm_counts(self):
+        """Per-arm successes and trials, in the layout of ``aggregate_counts``"""
+        table = self.summary(ARM)
+        return pd.DataFrame({
+            'successes': table['Conversions'],
+            'trials': table['Total_Users'],
+        })
+
+    def rate_table(self, dim):
+        """Conversion rate (%) with ``dim`` as rows and one column per arm"""
+        table = self.summary([ARM, dim])
+        return (table['Conversion_Rate'] * 100).unstack(level=0)
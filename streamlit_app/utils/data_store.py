@@ -0,0 +1,213 @@
+"""
+Process-wide dataset cache for the Streamlit app
+
+The parsed experiment frame is kept once per process and shared by every
+session and page. Entries are revalidated against the file's mtime and size
+on each call; when those change the content hash decides whether a re-parse
+is actually needed. Parsed frames are also persisted as a columnar snapshot
+(see ``snapshot.py``) so later cold starts skip the CSV parse entirely.
+
+Hashing and parsing run outside the cache lock: callers asking for a file
+that is already being loaded wait on its in-flight future, while other files
+and ``dataset_fingerprint`` carry on.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from instrumentation import span
+from schema import PARSE_DTYPES, SCHEMA_VERSION, apply_schema
+from snapshot import read_snapshot, snapshot_dir, write_snapshot
+
+# Get the path relative to this file (works locally and on cloud)
+_UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(_UTILS_DIR))
+DATA_PATH = os.path.join(PROJECT_ROOT, 'Data', 'marketing_AB.csv')
+
+_HASH_CHUNK_BYTES = 1 << 20
+
+_lock = threading.Lock()
+_entries = {}
+_pending = {}
+_stats = {
+    'hits': 0,
+    'misses': 0,
+    'coalesced': 0,
+    'revalidations': 0,
+    'loads': 0,
+    'snapshot_loads': 0,
+    'snapshot_writes': 0,
+    'load_time': 0.0,
+    'last_load_time': 0.0,
+}
+
+
+def file_digest(path):
+    """Return the blake2b hex digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_csv_typed(path):
+    """Parse the experiment CSV with the declared schema, rejecting invalid rows"""
+    return apply_schema(pd.read_csv(path, index_col=0, dtype=PARSE_DTYPES))
+
+
+def snapshot_tag(digest):
+    """Snapshot and fingerprint tag for a file whose content hash is ``digest``"""
+    # Frames are tied to both the source bytes and the schema they were cast with
+    return f'{digest}:schema-v{SCHEMA_VERSION}'
+
+
+def _parse(path, digest, use_snapshot):
+    """Load ``path`` from its snapshot when current, otherwise parse and snapshot it
+
+    Returns ``(frame, counter)`` where counter names the ``_stats`` entry to
+    bump (or None); the caller updates it under the lock.
+    """
+    if not use_snapshot:
+        with span('csv_parse'):
+            return read_csv_typed(path), None
+
+    tag = snapshot_tag(digest)
+    directory = snapshot_dir(path)
+    with span('snapshot_read'):
+        frame = read_snapshot(directory, tag)
+    if frame is not None:
+        return frame, 'snapshot_loads'
+
+    with span('csv_parse'):
+        frame = read_csv_typed(path)
+    try:
+        with span('snapshot_write'):
+            write_snapshot(frame, directory, tag)
+        return frame, 'snapshot_writes'
+    except OSError:
+        # Read-only deployments simply keep parsing the CSV
+        return frame, None
+
+
+def _load(path, st, entry, use_snapshot):
+    """Revalidate ``entry`` or parse ``path``; runs without the lock held"""
+    if entry is not None:
+        # File was touched: only re-parse if the bytes actually changed
+        digest = file_digest(path)
+        if digest == entry['digest']:
+            with _lock:
+                _stats['revalidations'] += 1
+                _stats['hits'] += 1
+                entry['mtime_ns'], entry['size'] = st.st_mtime_ns, st.st_size
+            return entry['frame']
+        with _lock:
+            _stats['revalidations'] += 1
+    else:
+        with span('file_digest'):
+            digest = file_digest(path)
+
+    start = time.perf_counter()
+    frame, counter = _parse(path, digest, use_snapshot)
+    elapsed = time.perf_counter() - start
+
+    with _lock:
+        _stats['misses'] += 1
+        _stats['loads'] += 1
+        _stats['load_time'] += elapsed
+        _stats['last_load_time'] = elapsed
+        if counter:
+            _stats[counter] += 1
+        _entries[path] = {
+            'frame': frame,
+            'digest': digest,
+            'fingerprint': snapshot_tag(digest),
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+        }
+    return frame
+
+
+def get_dataset(path=None, use_snapshot=True):
+    """Return the parsed dataset for ``path``, parsing at most once per file version"""
+    path = os.path.abspath(path or DATA_PATH)
+    st = os.stat(path)
+
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and (entry['mtime_ns'], entry['size']) == (st.st_mtime_ns, st.st_size):
+            _stats['hits'] += 1
+            return entry['frame']
+
+        pending = _pending.get(path)
+        if pending is not None:
+            _stats['coalesced'] += 1
+        else:
+            future = _pending[path] = Future()
+    if pending is not None:
+        return pending.result()
+
+    try:
+        frame = _load(path, st, entry, use_snapshot)
+    except BaseException as exc:
+        with _lock:
+            del _pending[path]
+        future.set_exception(exc)
+        raise
+    with _lock:
+        del _pending[path]
+    future.set_result(frame)
+    return frame
+
+
+def load_frame(path, use_snapshot=True):
+    """Parse ``path`` (through its snapshot) without keeping the frame in the cache
+
+    For callers that only aggregate the rows once, like the metrics service.
+    """
+    with span('file_digest'):
+        digest = file_digest(path)
+    frame, counter = _parse(os.path.abspath(path), digest, use_snapshot)
+    if counter:
+        with _lock:
+            _stats[counter] += 1
+    return frame
+
+
+def dataset_fingerprint(data):
+    """Return a stable identifier for the contents of ``data``
+
+    Frames handed out by this cache are identified by their source hash in
+    O(1); any other frame is hashed row by row.
+    """
+    with _lock:
+        for entry in _entries.values():
+            if entry['frame'] is data:
+                return entry['fingerprint']
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return 'frame:' + digest.hexdigest()
+
+
+def get_cache_stats():
+    """Return hit/miss counters and cumulative load time for the dataset cache"""
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_entries)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def clear_cache():
+    """Drop all cached datasets and reset the counters"""
+    with _lock:
+        _entries.clear()
+        for key in _stats:
+            _stats[key] = 0.0 if isinstance(_stats[key], float) else 0
@@ -0,0 +1,68 @@
+"""
+Cached Plotly figures
+
+Building a figure validates every trace and layout property, which costs more
+than the aggregates it plots. ``cached_figure`` builds each figure once per
+dataset fingerprint (plus any parameters the figure depends on), keeps its
+serialized JSON and afterwards rehydrates it without re-validation. The JSON
+is exactly what Streamlit sends over the websocket, so its size is the
+payload each chart costs.
+"""
+import json
+import threading
+import time
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from instrumentation import span
+from memo import LRUCache
+
+_cache = LRUCache(maxsize=128)
+_lock = threading.Lock()
+_stats = {}
+
+
+def cached_figure(name, key, build):
+    """Figure ``name`` for cache ``key`` (fingerprint and parameters); ``build()`` runs on a miss"""
+    built = []
+
+    def compute():
+        start = time.perf_counter()
+        with span('figure.build'):
+            figure = build()
+        with span('figure.serialize'):
+            spec = pio.to_json(figure, validate=False)
+        built.append(time.perf_counter() - start)
+        return spec
+
+    spec = _cache.get_or_compute((name, key), compute)
+    with _lock:
+        entry = _stats.setdefault(name, {'builds': 0, 'hits': 0, 'build_seconds': 0.0})
+        if built:
+            entry.update(builds=entry['builds'] + 1, build_seconds=built[0])
+        else:
+            entry['hits'] += 1
+        entry['payload_bytes'] = len(spec)
+    with span('figure.rehydrate'):
+        return go.Figure(json.loads(spec), _validate=False)
+
+
+def figure_stats(prefix=''):
+    """Builds, cache hits, last build time and payload size per figure"""
+    with _lock:
+        rows = {name: dict(entry) for name, entry in _stats.items() if name.startswith(prefix)}
+    table = pd.DataFrame.from_dict(rows, orient='index',
+                                   columns=['builds', 'hits', 'build_seconds', 'payload_bytes'])
+    table.index.name = 'figure'
+    table['build_ms'] = table.pop('build_seconds') * 1000
+    table['payload_kb'] = table.pop('payload_bytes') / 1024
+    return table
+
+
+def clear_figures():
+    """Drop cached figures and their statistics"""
+    _cache.clear()
+    with _lock:
+        _stats.clear()
@@ -1,81 +1,25 @@
 """
 Helper functions for Streamlit app
+
+Only the styling is defined here. Data loading and calculations live in
+``calculations`` and are resolved on first access (PEP 562 module
+``__getattr__``), so ``from helpers import apply_custom_css`` stays cheap while
+``from helpers import load_data`` keeps working for the analysis pages.
 """
-import pandas as pd
-import numpy as np
-import os
-from scipy import stats
-from statsmodels.stats.proportion import proportions_ztest, proportion_confint
+import importlib
 
-# Cache data loading for performance
-def load_data():
-    """Load and cache the marketing data"""
-    # Get the path relative to this file (works locally and on cloud)
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    streamlit_app_dir = os.path.dirname(current_dir)
-    project_root = os.path.dirname(streamlit_app_dir)
-    data_path = os.path.join(project_root, 'Data', 'marketing_AB.csv')
-    return pd.read_csv(data_path, index_col=0)
+def __getattr__(name):
+    """Import ``calculations`` the first time one of its names is requested"""
+    # Private and dunder probes (e.g. from inspect or pickle) must not trigger the import
+    if not name.startswith('_'):
+        calculations = importlib.import_module('calculations')
+        if hasattr(calculations, name):
+            value = globals()[name] = getattr(calculations, name)
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def calculate_metrics(data):
-    """Calculate all key metrics for the analysis"""
-    # Group-level metrics
-    ad_data = data[data['test group'] == 'ad']
-    psa_data = data[data['test group'] == 'psa']
-    
-    ad_conversions = ad_data['converted'].sum()
-    ad_total = len(ad_data)
-    ad_rate = ad_data['converted'].mean()
-    
-    psa_conversions = psa_data['converted'].sum()
-    psa_total = len(psa_data)
-    psa_rate = psa_data['converted'].mean()
-    
-    # Lift calculations
-    abs_diff = ad_rate - psa_rate
-    lift = (abs_diff / psa_rate) * 100
-    
-    # Statistical tests
-    count = np.array([ad_conversions, psa_conversions])
-    nobs = np.array([ad_total, psa_total])
-    z_stat, p_value = proportions_ztest(count, nobs, alternative='larger')
-    
-    # Confidence intervals
-    ad_ci = proportion_confint(ad_conversions, ad_total, alpha=0.05, method='normal')
-    psa_ci = proportion_confint(psa_conversions, psa_total, alpha=0.05, method='normal')
-    
-    # CI for lift
-    se_diff = np.sqrt((ad_rate * (1 - ad_rate) / ad_total) + 
-                      (psa_rate * (1 - psa_rate) / psa_total))
-    lift_ci_lower = abs_diff - (1.96 * se_diff)
-    lift_ci_upper = abs_diff + (1.96 * se_diff)
-    
-    # Effect size (Cohen's h)
-    cohens_h = 2 * (np.arcsin(np.sqrt(ad_rate)) - np.arcsin(np.sqrt(psa_rate)))
-    
-    # Chi-square test
-    contingency = pd.crosstab(data['test group'], data['converted'])
-    chi2, chi2_p, dof, expected = stats.chi2_contingency(contingency)
-    
-    return {
-        'ad_conversions': ad_conversions,
-        'ad_total': ad_total,
-        'ad_rate': ad_rate,
-        'psa_conversions': psa_conversions,
-        'psa_total': psa_total,
-        'psa_rate': psa_rate,
-        'abs_diff': abs_diff,
-        'lift': lift,
-        'z_stat': z_stat,
-        'p_value': p_value,
-        'ad_ci': ad_ci,
-        'psa_ci': psa_ci,
-        'lift_ci_lower': lift_ci_lower,
-        'lift_ci_upper': lift_ci_upper,
-        'cohens_h': cohens_h,
-        'chi2': chi2,
-        'chi2_p': chi2_p
-    }
+def __dir__():
+    return sorted(set(globals()) | set(importlib.import_module('calculations').__all__))
 
 def apply_custom_css():
     """Apply custom CSS for attractive styling"""
@@ -0,0 +1,138 @@
+"""
+Incremental aggregation for running experiments
+
+``IncrementalAggregator`` keeps the experiment's ``SegmentCube`` on disk along
+with how far each source has been read: a byte offset for CSV files that are
+appended to, and a list of already-ingested shard files. An update parses
+only the bytes written since the last one and adds their counts to the cube,
+so refreshing the statistics costs O(new rows).
+"""
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import SegmentCube
+from calculations import calculate_metrics_from_cube
+from parallel import expand_shards
+from schema import PARSE_DTYPES, apply_schema
+from streaming import stream_cube
+
+# Bytes at the start of a file used to detect that it was replaced, not appended
+_HEAD_BYTES = 4096
+
+
+def _head_digest(path, length):
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(length), digest_size=16).hexdigest()
+
+
+class IncrementalAggregator:
+    """Persistent cube plus per-source read positions"""
+
+    def __init__(self, state_path, cube=None, files=None, shards=None):
+        self.state_path = state_path
+        self.cube = cube
+        self.files = files or {}
+        self.shards = list(shards or [])
+
+    @classmethod
+    def load(cls, state_path):
+        """Load saved state, or start empty if ``state_path`` does not exist yet"""
+        if not os.path.exists(state_path):
+            return cls(state_path)
+        with np.load(state_path, allow_pickle=False) as saved:
+            meta = json.loads(str(saved['meta']))
+            cube = None
+            if meta['arms']:
+                cube = SegmentCube(meta['arms'], saved['users'], saved['conversions'],
+                                   saved['exposure_sum'], edges=saved['edges'])
+        return cls(state_path, cube, meta['files'], meta['shards'])
+
+    def save(self):
+        """Write the state atomically next to its final location"""
+        meta = {
+            'arms': self.cube.arms if self.cube is not None else [],
+            'files': self.files,
+            'shards': self.shards,
+        }
+        arrays = {'meta': np.array(json.dumps(meta))}
+        if self.cube is not None:
+            arrays.update(users=self.cube.users, conversions=self.cube.conversions,
+                          exposure_sum=self.cube.exposure_sum, edges=self.cube.edges)
+        tmp_path = f'{self.state_path}.tmp-{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.state_path)
+
+    def _fold(self, part):
+        self.cube = part if self.cube is None else self.cube.merge(part)
+
+    def ingest_file(self, path):
+        """Fold rows appended to ``path`` since the last call; return the row count"""
+        path = os.path.abspath(path)
+        source = self.files.get(path)
+        size = os.path.getsize(path)
+
+        if source is None:
+            with open(path, 'rb') as f:
+                header = f.readline()
+            # Nothing to register until the writer has finished the header line
+            if not header.endswith(b'\n'):
+                return 0
+            head_length = min(_HEAD_BYTES, size)
+            source = {
+                'offset': len(header),
+                'columns': header.decode().rstrip('\r\n').split(','),
+                'head_length': head_length,
+                'head_digest': _head_digest(path, head_length),
+            }
+        elif (size < source['offset'] or
+              _head_digest(path, source['head_length']) != source['head_digest']):
+            raise ValueError(f'{path} was truncated or rewritten; rebuild the state from scratch')
+
+        with open(path, 'rb') as f:
+            f.seek(source['offset'])
+            block = f.read()
+        # Leave a trailing partial line for the next update
+        end = block.rfind(b'\n') + 1
+        if end == 0:
+            self.files[path] = source
+            return 0
+
+        chunk = pd.read_csv(io.BytesIO(block[:end]), header=None, names=source['columns'],
+                            index_col=0, dtype=PARSE_DTYPES)
+        self._fold(SegmentCube.from_frame(apply_schema(chunk)))
+        source['offset'] += end
+        self.files[path] = source
+        return len(chunk)
+
+    def ingest_shards(self, spec):
+        """Fold shard files not seen before; return the number of new rows"""
+        rows = 0
+        for path in expand_shards(spec):
+            path = os.path.abspath(path)
+            if path in self.shards:
+                continue
+            part, stats = stream_cube(path)
+            self._fold(part)
+            self.shards.append(path)
+            rows += stats['rows']
+        return rows
+
+    def update(self, files=(), shards=None):
+        """Ingest new data from ``files`` and ``shards``, persist, and return new rows"""
+        rows = sum(self.ingest_file(path) for path in files)
+        if shards is not None:
+            rows += self.ingest_shards(shards)
+        self.save()
+        return rows
+
+    def metrics(self, **params):
+        """Current z-test/chi-square/CI outputs, derived from the counts alone"""
+        if self.cube is None:
+            raise ValueError('No rows ingested yet')
+        return calculate_metrics_from_cube(self.cube, **params)
@@ -0,0 +1,321 @@
+"""
+Hot-path instrumentation for the Streamlit pages
+
+Spans time the helpers (CSV parse, snapshot reads, metrics, cube builds,
+figure build/serialization) and each section of a page rerun. Samples are
+aggregated per page and span into a Prometheus-style histogram plus a window
+of recent samples for p50/p95/p99, and can be exported as JSON or Prometheus
+text to a file or a local HTTP endpoint. A single rerun of a page can also be
+captured with cProfile on demand.
+
+Everything is off unless ``AB_INSTRUMENT=1`` is set (or ``enable()`` is
+called). While off, ``span`` returns a shared no-op context manager and
+``timed`` functions cost one flag check per call.
+
+- ``AB_METRICS_PORT``: serve ``/metrics`` (Prometheus) and ``/metrics.json``
+  on 127.0.0.1 from the first instrumented rerun on. If the port cannot be
+  bound the error is logged once and the pages run without the endpoint.
+- ``AB_METRICS_FILE``: rewrite this file after every rerun (Prometheus text
+  when it ends in ``.prom``, JSON otherwise)
+
+Only the standard library is used, so importing this costs nothing on pages
+that never load pandas.
+"""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the histogram buckets; +Inf is implicit
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent samples kept per page and span for the quantiles
+WINDOW = 1024
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Rows shown from a captured profile
+PROFILE_LINES = 40
+
+# Page label for spans recorded outside a page rerun (scripts, benchmarks)
+NO_PAGE = '-'
+
+_enabled = os.environ.get('AB_INSTRUMENT', '').lower() not in ('', '0', 'false', 'no')
+_lock = threading.Lock()
+_series = {}
+_profile_requests = set()
+_profiles = {}
+_local = threading.local()
+_server = None
+_server_failed = False
+_log = logging.getLogger(__name__)
+_NULL = contextlib.nullcontext()
+
+
+def enable(on=True):
+    """Turn recording on or off for the whole process"""
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled
+
+
+def record(name, seconds, page=None):
+    """Add one ``seconds`` sample for span ``name`` on ``page`` (the current page by default)"""
+    key = (page or getattr(_local, 'page', None) or NO_PAGE, name)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                     'buckets': [0] * len(BUCKETS), 'recent': deque(maxlen=WINDOW)}
+        series['count'] += 1
+        series['sum'] += seconds
+        series['max'] = max(series['max'], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series['buckets'][i] += 1
+                break
+        series['recent'].append(seconds)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing its block as span ``name`` (a shared no-op while disabled)"""
+    return _Span(name) if _enabled else _NULL
+
+
+def timed(name):
+    """Decorator recording every call of the function as span ``name``"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def begin_rerun(page):
+    """Mark the start of a rerun of ``page``; call at the top of the page script"""
+    if not _enabled:
+        return
+    _stop_profiler()
+    now = time.perf_counter()
+    _local.page = page
+    _local.rerun_start = now
+    _local.section = None
+    with _lock:
+        profile = page in _profile_requests
+        _profile_requests.discard(page)
+    if profile:
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+    if os.environ.get('AB_METRICS_PORT') and not _server_failed:
+        _serve_env_metrics()
+
+
+def section(name):
+    """Close the running section span and open ``name``; call before each page section"""
+    if not _enabled or getattr(_local, 'rerun_start', None) is None:
+        return
+    now = time.perf_counter()
+    _close_section(now)
+    _local.section = (name, now)
+
+
+def _close_section(now):
+    current = getattr(_local, 'section', None)
+    if current is not None:
+        record(f'section.{current[0]}', now - current[1])
+        _local.section = None
+
+
+def end_rerun():
+    """Record the rerun total, close the last section and finish any profile capture"""
+    start = getattr(_local, 'rerun_start', None)
+    if not _enabled or start is None:
+        return
+    now = time.perf_counter()
+    _close_section(now)
+    record('rerun', now - start)
+    profiler = _stop_profiler()
+    if profiler is not None:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        with _lock:
+            _profiles[_local.page] = {'seconds': now - start, 'captured_at': time.time(),
+                                      'text': out.getvalue()}
+    _local.rerun_start = None
+    if os.environ.get('AB_METRICS_FILE'):
+        write_metrics(os.environ['AB_METRICS_FILE'])
+
+
+def _stop_profiler():
+    profiler = getattr(_local, 'profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _local.profiler = None
+    return profiler
+
+
+def request_profile(page):
+    """Capture the next rerun of ``page`` with cProfile"""
+    with _lock:
+        _profile_requests.add(page)
+
+
+def last_profile(page):
+    """The most recent capture for ``page`` (seconds, captured_at, text) or None"""
+    with _lock:
+        return _profiles.get(page)
+
+
+def _quantile(ordered, q):
+    position = q * (len(ordered) - 1)
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def snapshot():
+    """Summary of every series: count, mean, max and recent-window quantiles, in seconds"""
+    with _lock:
+        items = [(key, dict(series, recent=sorted(series['recent']), buckets=list(series['buckets'])))
+                 for key, series in _series.items()]
+    rows = []
+    for (page, name), series in sorted(items):
+        row = {'page': page, 'span': name, 'count': series['count'],
+               'mean': series['sum'] / series['count'], 'max': series['max'], 'sum': series['sum'],
+               'buckets': series['buckets']}
+        for q in QUANTILES:
+            row[f'p{round(q * 100)}'] = _quantile(series['recent'], q)
+        rows.append(row)
+    return rows
+
+
+def page_timings(page):
+    """Rows for a page's timing panel, in milliseconds, slowest p95 first"""
+    rows = [{'span': row['span'], 'count': row['count'],
+             **{f'p{round(q * 100)}_ms': row[f'p{round(q * 100)}'] * 1000 for q in QUANTILES},
+             'max_ms': row['max'] * 1000}
+            for row in snapshot() if row['page'] == page]
+    return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+
+def to_json():
+    return json.dumps({'enabled': _enabled, 'buckets': BUCKETS, 'series': snapshot()}, indent=2)
+
+
+def _labels(page, name, **extra):
+    pairs = {'page': page, 'span': name, **extra}
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in pairs.values())
+    return ','.join(f'{key}="{value}"' for key, value in zip(pairs, escaped))
+
+
+def to_prometheus():
+    """Prometheus text exposition: a histogram and a recent-window summary per page and span"""
+    rows = snapshot()
+    lines = ['# HELP ab_span_seconds Time spent in instrumented spans.',
+             '# TYPE ab_span_seconds histogram']
+    for row in rows:
+        cumulative = 0
+        for bound, count in zip(BUCKETS, row['buckets']):
+            cumulative += count
+            lines.append(f"ab_span_seconds_bucket{{{_labels(row['page'], row['span'], le=bound)}}} {cumulative}")
+        lines.append(f"ab_span_seconds_bucket{{{_labels(row['page'], row['span'], le='+Inf')}}} {row['count']}")
+        lines.append(f"ab_span_seconds_sum{{{_labels(row['page'], row['span'])}}} {row['sum']}")
+        lines.append(f"ab_span_seconds_count{{{_labels(row['page'], row['span'])}}} {row['count']}")
+    lines += [f'# HELP ab_span_recent_seconds Quantiles over the last {WINDOW} samples per span.',
+              '# TYPE ab_span_recent_seconds summary']
+    for row in rows:
+        for q in QUANTILES:
+            value = row[f'p{round(q * 100)}']
+            lines.append(f"ab_span_recent_seconds{{{_labels(row['page'], row['span'], quantile=q)}}} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path):
+    """Write the metrics to ``path`` atomically: Prometheus text for ``.prom``, JSON otherwise"""
+    text = to_prometheus() if path.endswith('.prom') else to_json()
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = to_prometheus(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = to_json(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Start the metrics endpoint in a daemon thread (once per process) and return the server"""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='ab-metrics', daemon=True).start()
+        return _server
+
+
+def _serve_env_metrics():
+    """Start the ``AB_METRICS_PORT`` endpoint; a failure is logged once and not retried"""
+    global _server_failed
+    try:
+        serve_metrics(int(os.environ['AB_METRICS_PORT']))
+    except (OSError, ValueError) as exc:
+        _server_failed = True
+        _log.warning('Metrics endpoint disabled: cannot serve on AB_METRICS_PORT=%s (%s)',
+                     os.environ['AB_METRICS_PORT'], exc)
+
+
+def reset():
+    """Drop all recorded samples and captured profiles"""
+    with _lock:
+        _series.clear()
+        _profiles.clear()
+        _profile_requests.clear()
@@ -0,0 +1,101 @@
+"""
+Multi-arm comparisons with multiple-testing correction
+
+Campaigns with several creatives are compared either against a control arm
+or all-pairs. Every comparison is a two-arm test on the per-arm counts, so
+the whole set is one ``batch_metrics`` call over index arrays into the count
+matrix. P-values are then adjusted for the number of comparisons (Holm
+controls the family-wise error rate, Benjamini-Hochberg the false discovery
+rate).
+"""
+import numpy as np
+import pandas as pd
+from statsmodels.stats.multitest import multipletests
+
+from batch import batch_metrics
+
+TREATMENT_ARM = 'ad'
+CONTROL_ARM = 'psa'
+
+# Names accepted for ``correction``, mapped to statsmodels methods
+CORRECTIONS = {
+    'holm': 'holm',
+    'bh': 'fdr_bh',
+    'bonferroni': 'bonferroni',
+    'none': None,
+}
+
+
+def split_arms(arms, control=CONTROL_ARM):
+    """Return (control, treatments) for an arm list; the last arm is control if ``control`` is absent"""
+    arms = list(arms)
+    if control not in arms:
+        control = arms[-1]
+    return control, [arm for arm in arms if arm != control]
+
+
+def primary_pair(arms, treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """Return (treatment, control) for the headline two-arm analysis
+
+    Control is resolved by ``split_arms``; ``treatment`` falls back to the first other arm.
+    """
+    control, treatments = split_arms(arms, control)
+    if not treatments:
+        raise ValueError(f'Need at least two arms, got {list(arms)}')
+    return (treatment if treatment in treatments else treatments[0]), control
+
+
+def comparison_pairs(arms, control=CONTROL_ARM):
+    """Index arrays (arm, baseline) into ``arms`` for vs-control or, with ``control=None``, all pairs"""
+    arms = list(arms)
+    if control is None:
+        baseline, arm = np.triu_indices(len(arms), k=1)
+        return arm, baseline
+    control, treatments = split_arms(arms, control)
+    arm = np.array([arms.index(a) for a in treatments], dtype=np.intp)
+    return arm, np.full(len(arm), arms.index(control), dtype=np.intp)
+
+
+def adjust_pvalues(p_values, correction='holm'):
+    """Adjust p-values for multiple comparisons"""
+    if correction not in CORRECTIONS:
+        raise ValueError(f'Unknown correction {correction!r}; expected one of {sorted(CORRECTIONS)}')
+    p_values = np.asarray(p_values, dtype=np.float64)
+    method = CORRECTIONS[correction]
+    if method is None or p_values.size == 0:
+        return p_values
+    return multipletests(p_values, method=method)[1]
+
+
+def compare_arms(counts, control=CONTROL_ARM, alpha=0.05, alternative='two-sided',
+                 correction='holm', ci_method='normal'):
+    """Test every arm against ``control`` (or all pairs when ``control`` is None)
+
+    ``counts`` is a successes/trials frame indexed by arm, as returned by
+    ``aggregate_counts`` or ``SegmentCube.arm_counts``. Returns one row per
+    comparison.
+    """
+    arms = list(counts.index)
+    successes = counts['successes'].to_numpy()
+    trials = counts['trials'].to_numpy()
+    arm, baseline = comparison_pairs(arms, control)
+
+    results = batch_metrics(successes[arm], trials[arm], successes[baseline], trials[baseline],
+                            alpha=alpha, alternative=alternative, ci_method=ci_method)
+    p_adjusted = adjust_pvalues(results['p_value'], correction)
+
+    return pd.DataFrame({
+        'arm': [arms[i] for i in arm],
+        'baseline': [arms[i] for i in baseline],
+        'arm_rate': results['ad_rate'],
+        'baseline_rate': results['psa_rate'],
+        'abs_diff': results['abs_diff'],
+        'lift': results['lift'],
+        'lift_ci_lower': results['lift_ci_lower'],
+        'lift_ci_upper': results['lift_ci_upper'],
+        'cohens_h': results['cohens_h'],
+        'z_stat': results['z_stat'],
+        'p_value': results['p_value'],
+        'p_adjusted': p_adjusted,
+        'significant': p_adjusted < alpha,
+    })
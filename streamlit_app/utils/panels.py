@@ -0,0 +1,34 @@
+"""
+Streamlit widgets shared by the analysis pages
+
+Kept apart from ``instrumentation`` and ``figures`` so the headless report
+and service code never import Streamlit.
+"""
+import pandas as pd
+import streamlit as st
+
+from figures import figure_stats
+from instrumentation import is_enabled, last_profile, page_timings, request_profile
+
+
+def timing_panel(page, prefix):
+    """Render the chart build time and rerun timing expanders for ``page``
+
+    ``prefix`` selects the page's figures in the figure cache (e.g. 'tests.').
+    Call it after ``end_rerun()`` so the panel itself is not timed.
+    """
+    with st.expander("Chart build times"):
+        st.dataframe(figure_stats(prefix).round(2), use_container_width=True)
+
+    with st.expander("Rerun timings"):
+        if is_enabled():
+            st.dataframe(pd.DataFrame(page_timings(page)).round(2), use_container_width=True)
+            if st.button("Profile next rerun"):
+                request_profile(page)
+                st.rerun()
+            profile = last_profile(page)
+            if profile:
+                st.caption(f"cProfile of a {profile['seconds'] * 1000:.0f} ms rerun, by cumulative time")
+                st.code(profile['text'])
+        else:
+            st.caption("Start the app with AB_INSTRUMENT=1 to record per-section timings.")
@@ -0,0 +1,121 @@
+"""
+Power and sample size for two-proportion tests with unequal allocation
+
+The fast path is the normal approximation for a z-test of the control rate
+``baseline`` against ``baseline * (1 + mde)`` with a share ``allocation`` of
+users in the treatment arm (pooled variance under H0, unpooled under H1).
+It is written with ``scipy.special`` ufuncs, so it costs microseconds and
+broadcasts over arrays of inputs, which is what the sliders and power curves
+need.
+
+``exact_power`` validates it: it sums the two binomial distributions over
+every outcome within a wide band around the expected counts and applies the
+actual pooled z-test to each, so discreteness and small expected counts are
+accounted for.
+
+Only ``scipy.special`` is imported (binomial probabilities come from
+``gammaln`` and the MDE from bisection), which keeps the Hypothesis page
+clear of the much slower ``scipy.stats`` and ``scipy.optimize`` imports.
+"""
+import numpy as np
+from scipy.special import gammaln, ndtr, ndtri, xlog1py, xlogy
+
+# Largest relative lift ``minimum_detectable_effect`` searches over
+MAX_MDE = 10.0
+
+# Bisection steps for minimum_detectable_effect; the bracket shrinks below 1e-15
+_BISECT_STEPS = 60
+
+# Outcomes further than this many standard deviations from the mean are ignored by exact_power
+_TAIL_SDS = 10
+
+# exact_power evaluates the outcome grid in blocks of at most this many cells
+_BLOCK_CELLS = 1 << 22
+
+# Above this many users exact_power is slow and agrees with power_at anyway
+EXACT_MAX_USERS = 2_000_000
+
+
+def _z_alpha(alpha, alternative):
+    if alternative == 'two-sided':
+        return -ndtri(np.asarray(alpha) / 2)
+    if alternative == 'larger':
+        return -ndtri(alpha)
+    raise ValueError(f'Unknown alternative: {alternative!r}')
+
+
+def _variances(baseline, mde, allocation):
+    """Lift and per-user variance of the difference in rates under H0 and H1"""
+    treated = baseline * (1 + mde)
+    pooled = allocation * treated + (1 - allocation) * baseline
+    var_null = pooled * (1 - pooled) * (1 / allocation + 1 / (1 - allocation))
+    var_alt = baseline * (1 - baseline) / (1 - allocation) + treated * (1 - treated) / allocation
+    return baseline * mde, var_null, var_alt
+
+
+def required_sample_size(baseline, mde, allocation=0.5, alpha=0.05, power=0.8, alternative='two-sided'):
+    """Total users needed to detect a relative lift ``mde`` over ``baseline`` (arrays broadcast)"""
+    delta, var_null, var_alt = _variances(baseline, mde, allocation)
+    z = _z_alpha(alpha, alternative) * np.sqrt(var_null) + ndtri(power) * np.sqrt(var_alt)
+    return z ** 2 / delta ** 2
+
+
+def power_at(baseline, mde, total, allocation=0.5, alpha=0.05, alternative='two-sided'):
+    """Power of the test with ``total`` users (arrays broadcast)"""
+    delta, var_null, var_alt = _variances(baseline, mde, allocation)
+    z_a = _z_alpha(alpha, alternative)
+    return ndtr((np.abs(delta) * np.sqrt(total) - z_a * np.sqrt(var_null)) / np.sqrt(var_alt))
+
+
+def minimum_detectable_effect(baseline, total, allocation=0.5, alpha=0.05, power=0.8,
+                              alternative='two-sided'):
+    """Smallest relative lift detectable with ``total`` users (NaN above ``MAX_MDE``)"""
+    low, high = 0.0, min(MAX_MDE, 1 / baseline - 1)
+    if power_at(baseline, high, total, allocation, alpha, alternative) < power:
+        return float('nan')
+    # Power increases with the lift, so halve the bracket around the crossing
+    for _ in range(_BISECT_STEPS):
+        mid = (low + high) / 2
+        if power_at(baseline, mid, total, allocation, alpha, alternative) < power:
+            low = mid
+        else:
+            high = mid
+    return float(high)
+
+
+def _support(n, p):
+    sd = np.sqrt(n * p * (1 - p))
+    low = max(0, int(np.floor(n * p - _TAIL_SDS * sd)))
+    high = min(n, int(np.ceil(n * p + _TAIL_SDS * sd)))
+    counts = np.arange(low, high + 1)
+    log_pmf = (gammaln(n + 1) - gammaln(counts + 1) - gammaln(n - counts + 1)
+               + xlogy(counts, p) + xlog1py(n - counts, -p))
+    pmf = np.exp(log_pmf)
+    # Put the truncated tails' mass back so the probabilities sum to one
+    return counts, pmf / pmf.sum()
+
+
+def exact_power(baseline, mde, total, allocation=0.5, alpha=0.05, alternative='two-sided'):
+    """Power of the pooled two-proportion z-test from the binomial distributions themselves
+
+    The treated x control outcome grid grows with ``total``; it is summed in
+    blocks so memory stays bounded, but time does not (see ``EXACT_MAX_USERS``).
+    """
+    n_treated = int(round(total * allocation))
+    n_control = int(round(total)) - n_treated
+    treated, p_treated = _support(n_treated, baseline * (1 + mde))
+    control, p_control = _support(n_control, baseline)
+    z_a = _z_alpha(alpha, alternative)
+
+    x2 = control[None, :]
+    rows = max(1, _BLOCK_CELLS // len(control))
+    power = 0.0
+    for start in range(0, len(treated), rows):
+        x1 = treated[start:start + rows, None]
+        pooled = (x1 + x2) / (n_treated + n_control)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / n_treated + 1 / n_control))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (x1 / n_treated - x2 / n_control) / se
+        rejects = np.abs(z) > z_a if alternative == 'two-sided' else z > z_a
+        power += p_treated[start:start + rows] @ rejects @ p_control
+    return float(np.clip(power, 0.0, 1.0))
@@ -0,0 +1,109 @@
+"""
+Pre-analysis data-quality checks
+
+Run once per dataset before any test is read:
+
+- sample-ratio mismatch (SRM): a chi-square goodness-of-fit test of the arm
+  counts against the allocation the experiment was configured with. A
+  mismatch means assignment or logging is broken and every downstream
+  result is suspect. Experiments whose arms the allocation does not name are
+  tested against equal shares across the observed arms.
+- duplicate ``user id`` values, found with a single hash-table pass over
+  that one column instead of hashing every full row. Only rows whose id
+  repeats are checked further, for exact duplicates and for users logged
+  in more than one arm.
+- null counts and out-of-range values per column.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from schema import SCHEMA, RANGES
+
+# Share of users the experiment was configured to assign to each arm
+EXPECTED_ALLOCATION = {'ad': 0.96, 'psa': 0.04}
+
+# SRM alarms are conventionally raised at a much stricter level than the test itself
+SRM_THRESHOLD = 0.001
+
+
+def parse_allocation(text):
+    """'ad=0.96,psa=0.04' -> {'ad': 0.96, 'psa': 0.04}"""
+    allocation = {}
+    for item in text.split(','):
+        arm, _, share = item.partition('=')
+        allocation[arm.strip()] = float(share)
+    return allocation
+
+
+def srm_test(arm_counts, allocation=EXPECTED_ALLOCATION, threshold=SRM_THRESHOLD):
+    """Chi-square goodness-of-fit of observed arm counts against ``allocation``
+
+    If an observed arm has no share in ``allocation`` the configured split
+    cannot apply, so equal shares across the observed arms are assumed
+    instead; ``equal_shares`` reports when that happened.
+    """
+    unexpected = sorted(set(arm_counts.index) - set(allocation))
+    if unexpected:
+        allocation = dict.fromkeys(sorted(arm_counts.index), 1.0)
+    arms = list(allocation)
+    observed = np.array([arm_counts.get(arm, 0) for arm in arms], dtype=np.float64)
+    shares = np.array([allocation[arm] for arm in arms], dtype=np.float64)
+    expected = observed.sum() * shares / shares.sum()
+    chi2, p_value = stats.chisquare(observed, expected)
+    return {
+        'observed': dict(zip(arms, observed.astype(np.int64).tolist())),
+        'expected': dict(zip(arms, expected.tolist())),
+        'observed_share': dict(zip(arms, (observed / observed.sum()).tolist())),
+        'expected_share': dict(zip(arms, (shares / shares.sum()).tolist())),
+        'chi2': float(chi2),
+        'p_value': float(p_value),
+        'unexpected_arms': unexpected,
+        'equal_shares': bool(unexpected),
+        'mismatch': bool(p_value < threshold),
+    }
+
+
+def duplicate_check(data, id_col='user id', group_col='test group'):
+    """Repeated ids, exact duplicate rows and ids assigned to more than one arm"""
+    repeated = pd.Index(data[id_col].to_numpy()).duplicated(keep=False)
+    suspects = data[repeated]
+    return {
+        'duplicate_ids': int(suspects[id_col].nunique()),
+        'duplicate_id_rows': int(len(suspects)),
+        'duplicate_rows': int(suspects.duplicated().sum()),
+        'conflicting_assignments': int((suspects.groupby(id_col, observed=True)[group_col].nunique() > 1).sum()),
+    }
+
+
+def range_check(data):
+    """Count of values outside the declared ``RANGES`` per integer column"""
+    violations = {}
+    for column, (low, high) in RANGES.items():
+        if column in data.columns:
+            values = data[column].to_numpy()
+            violations[column] = int(((values < low) | (values > high)).sum())
+    return violations
+
+
+def quality_report(data, allocation=EXPECTED_ALLOCATION):
+    """Every check above for ``data``, with the time the checks took"""
+    start = time.perf_counter()
+    nulls = data.isna().sum()
+    report = {
+        'rows': len(data),
+        'columns': len(data.columns),
+        'missing_columns': [column for column in SCHEMA if column not in data.columns],
+        'nulls': {column: int(count) for column, count in nulls.items()},
+        'null_total': int(nulls.sum()),
+        'range_violations': range_check(data),
+        'arm_counts': data['test group'].value_counts(sort=False),
+        **duplicate_check(data),
+    }
+    report['srm'] = srm_test(report['arm_counts'], allocation)
+    report['passed'] = not (report['missing_columns'] or report['null_total'] or report['duplicate_ids']
+                            or any(report['range_violations'].values()) or report['srm']['mismatch'])
+    report['seconds'] = time.perf_counter() - start
+    return report
@@ -0,0 +1,385 @@
+"""
+Headless experiment reports
+
+``analyze`` runs the whole pipeline the Streamlit pages show for one
+experiment file:
+- load
+- data-quality checks
+- metrics and tests
+- per-arm comparisons
+- Bayesian, sequential and covariate-adjusted results
+- segment and stratified analyses
+- dose-response and the decision criteria
+
+It returns plain JSON-ready data, and ``render_html`` turns that into a
+self-contained static page.
+
+``run_reports`` fans many files out over worker processes. Each worker writes
+``<name>.json`` and ``<name>.html``; the parent then writes ``summary.json``
+and an ``index.html`` linking every report. A file that fails is reported as
+an error instead of stopping the run.
+"""
+import html
+import json
+import math
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from adjustment import adjusted_effect
+from bayesian import bayesian_summary
+from calculations import calculate_metrics_from_cube
+from cube import ARM, DAY, DOSE_BINS, DOSE_LABELS, EXPOSURE, HOUR, SegmentCube
+from data_store import clear_cache, get_dataset
+from multiarm import CONTROL_ARM, TREATMENT_ARM, compare_arms
+from parallel import expand_shards
+from quality import EXPECTED_ALLOCATION, quality_report, srm_test
+from sequential import msprt
+from stratified import stratified_analysis
+from streaming import stream_cube
+
+# Dose-response groups with fewer users are left out, as on the Analysis page
+MIN_DOSE_USERS = 100
+
+# Decision thresholds shared with the Decision page
+PROB_BETTER_THRESHOLD = 0.95
+EXPECTED_LOSS_THRESHOLD = 1e-4
+
+
+def jsonable(value):
+    """Convert numpy, pandas and tuple values into JSON types (NaN and inf become None)"""
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return jsonable(value.reset_index().to_dict(orient='records'))
+    if isinstance(value, pd.Series):
+        return jsonable(value.to_dict())
+    if isinstance(value, np.ndarray):
+        return jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _consistency(cube, dim, treatment, control):
+    """Share of ``dim`` levels where the treatment converts better than control (informational)"""
+    rates = cube.rate_table(dim)[[treatment, control]].dropna()
+    return float((rates[treatment] > rates[control]).mean())
+
+
+def decision_criteria(metrics, bayes, srm, heterogeneity_p, alpha=0.05):
+    """The Decision page's checklist evaluated against this experiment
+
+    Consistency across days and hours is judged by Woolf's heterogeneity
+    test rather than by the sign of every segment, which small control
+    segments flip by chance.
+    """
+    treatment, control = metrics['treatment_arm'].upper(), metrics['control_arm'].upper()
+    criteria = [
+        ('P-value', f'< {alpha}', f"{metrics['p_value']:.3g}", metrics['p_value'] < alpha),
+        ('Confidence interval', 'Above zero',
+         f"[{metrics['lift_ci_lower'] * 100:.2f}pp, {metrics['lift_ci_upper'] * 100:.2f}pp]",
+         metrics['lift_ci_lower'] > 0),
+        ('Consistency', f'Heterogeneity p >= {alpha} (days & hours)',
+         ', '.join(f'{dim}: {p:.3f}' for dim, p in heterogeneity_p.items()),
+         min(heterogeneity_p.values()) >= alpha),
+        (f'P({treatment} > {control})', f'> {PROB_BETTER_THRESHOLD:.0%}', f"{bayes['prob_ad_better']:.2%}",
+         bayes['prob_ad_better'] > PROB_BETTER_THRESHOLD),
+        ('Expected loss', f'< {EXPECTED_LOSS_THRESHOLD * 100:g}pp', f"{bayes['expected_loss_ad'] * 100:.4f}pp",
+         bayes['expected_loss_ad'] < EXPECTED_LOSS_THRESHOLD),
+        ('Sample ratio', 'No mismatch', f"p = {srm['p_value']:.3g}", not srm['mismatch']),
+    ]
+    return [{'criterion': name, 'threshold': threshold, 'value': value, 'passed': bool(passed)}
+            for name, threshold, value, passed in criteria]
+
+
+def recommend(criteria):
+    """'implement' when every criterion passes, otherwise 'review'"""
+    return 'implement' if all(c['passed'] for c in criteria) else 'review'
+
+
+def segment_breakdown(cube, dim, alpha=0.05, treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """Per-arm conversion rates and the stratified analysis across ``dim``"""
+    result = stratified_analysis(cube, dim, treatment=treatment, control=control, alpha=alpha)
+    return {
+        'rates': cube.rate_table(dim),
+        'strata': result.pop('strata'),
+        **result,
+    }
+
+
+def dose_response(cube, treatment=TREATMENT_ARM):
+    """Treatment conversion by ad-frequency group, dropping groups under ``MIN_DOSE_USERS``"""
+    dose = cube.summary(EXPOSURE, arm=treatment, bins=DOSE_BINS, labels=DOSE_LABELS)
+    return dose[dose['Total_Users'] >= MIN_DOSE_USERS]
+
+
+def analyze(path, alpha=0.05, stream=False, n_draws=200_000, allocation=EXPECTED_ALLOCATION):
+    """Full analysis of the experiment file at ``path`` as JSON-ready data
+
+    ``stream=True`` aggregates the CSV chunk by chunk without holding its rows.
+    Only the SRM check needs no rows, so the other quality checks are skipped.
+    """
+    timings = {}
+    start = time.perf_counter()
+    if stream:
+        cube, stream_stats = stream_cube(path)
+        quality = {'rows': cube.total_users, 'streamed': True, 'chunks': stream_stats['chunks']}
+        timings['load'] = time.perf_counter() - start
+    else:
+        data = get_dataset(path)
+        timings['load'] = time.perf_counter() - start
+        mark = time.perf_counter()
+        quality = quality_report(data, allocation)
+        timings['quality'] = time.perf_counter() - mark
+        mark = time.perf_counter()
+        cube = SegmentCube.from_frame(data)
+        timings['cube'] = time.perf_counter() - mark
+    counts = cube.arm_counts()
+    quality['srm'] = srm_test(counts['trials'], allocation)
+
+    mark = time.perf_counter()
+    metrics = calculate_metrics_from_cube(cube, alpha=alpha)
+    treatment, control = metrics['treatment_arm'], metrics['control_arm']
+    successes, trials = counts['successes'], counts['trials']
+    bayes = bayesian_summary(int(successes[treatment]), int(trials[treatment]),
+                             int(successes[control]), int(trials[control]), n_draws=n_draws, alpha=alpha)
+    sequential = msprt(int(successes[treatment]), int(trials[treatment]),
+                       int(successes[control]), int(trials[control]), alpha=alpha)
+    tests = {
+        'metrics': metrics,
+        'arm_comparisons': compare_arms(counts, control=control, alpha=alpha),
+        'bayesian': bayes,
+        'sequential': sequential,
+        'adjusted': adjusted_effect(cube, treatment=treatment, control=control, alpha=alpha),
+    }
+    timings['tests'] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    segments = {dim: segment_breakdown(cube, dim, alpha, treatment, control) for dim in (DAY, HOUR, EXPOSURE)}
+    dose = dose_response(cube, treatment)
+    consistency = {dim: _consistency(cube, dim, treatment, control) for dim in (DAY, HOUR)}
+    timings['segments'] = time.perf_counter() - mark
+
+    heterogeneity_p = {dim: segments[dim]['heterogeneity_p'] for dim in (DAY, HOUR)}
+    criteria = decision_criteria(metrics, bayes, quality['srm'], heterogeneity_p, alpha)
+    timings['total'] = time.perf_counter() - start
+    return jsonable({
+        'path': os.path.abspath(path),
+        'rows': cube.total_users,
+        'alpha': alpha,
+        'arms': cube.summary(ARM),
+        'quality': quality,
+        **tests,
+        'segments': segments,
+        'consistency': consistency,
+        'dose_response': dose,
+        'optimal_dose': str(dose['Conversion_Rate'].idxmax()) if len(dose) else None,
+        'decision': {
+            'criteria': criteria,
+            'recommendation': recommend(criteria),
+        },
+        'timings': timings,
+    })
+
+
+_STYLE = """
+body { font-family: -apple-system, 'Segoe UI', sans-serif; margin: 2em auto; max-width: 1100px; color: #2c3e50; }
+h1 { font-weight: 600; }
+h2 { color: #34495e; font-weight: 500; border-bottom: 2px solid #667eea; padding-bottom: 8px; margin-top: 1.8em; }
+table { border-collapse: collapse; margin: 0.8em 0; font-size: 0.9em; }
+th { background-color: #667eea; color: white; padding: 6px 10px; text-align: left; }
+td { padding: 5px 10px; border-bottom: 1px solid #ddd; }
+.success-box { background-color: #e8f5e9; border-left: 4px solid #4caf50; padding: 12px; border-radius: 5px; }
+.warning-box { background-color: #fff3e0; border-left: 4px solid #ff9800; padding: 12px; border-radius: 5px; }
+.bar { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); height: 12px; border-radius: 3px; }
+.pass { color: #2e7d32; font-weight: 600; } .fail { color: #c62828; font-weight: 600; }
+"""
+
+
+def format_stat(value, spec):
+    """``format(value, spec)``, or '-' for statistics that came out None or NaN"""
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return '-'
+    return format(value, spec)
+
+
+def _table(rows, columns=None, digits=4):
+    """HTML table for a list of record dicts (or one flat dict as field/value rows)"""
+    if isinstance(rows, dict):
+        rows = [{'field': key, 'value': value} for key, value in rows.items()
+                if not isinstance(value, (dict, list))]
+    frame = pd.DataFrame(rows, columns=columns)
+    return frame.to_html(index=False, na_rep='-', float_format=lambda v: f'{v:.{digits}g}', border=0)
+
+
+def render_html(report):
+    """Self-contained static HTML page for one ``analyze`` result"""
+    name = html.escape(os.path.basename(report['path']))
+    m = report['metrics']
+    decision = report['decision']
+    box = 'success-box' if decision['recommendation'] == 'implement' else 'warning-box'
+    criteria = ''.join(
+        f"<tr><td>{html.escape(c['criterion'])}</td><td>{html.escape(c['threshold'])}</td>"
+        f"<td>{html.escape(c['value'])}</td>"
+        f"<td class=\"{'pass' if c['passed'] else 'fail'}\">{'PASS' if c['passed'] else 'FAIL'}</td></tr>"
+        for c in decision['criteria']
+    )
+    top_rate = max((row['Conversion_Rate'] for row in report['dose_response']), default=0) or 1
+    dose = ''.join(
+        f"<tr><td>{html.escape(str(row['exposure']))}</td><td>{row['Total_Users']:,}</td>"
+        f"<td>{row['Conversion_Rate'] * 100:.2f}%</td>"
+        f"<td style=\"width: 300px\"><div class=\"bar\" style=\"width: {row['Conversion_Rate'] / top_rate * 100:.0f}%\">"
+        f"</div></td></tr>"
+        for row in report['dose_response']
+    )
+    segments = ''.join(
+        f"<h3>{html.escape(dim)}</h3>"
+        f"<p>CMH &chi;&sup2; = {format_stat(seg['cmh'], '.2f')} (p = {format_stat(seg['cmh_p'], '.3g')}), "
+        f"pooled odds ratio {format_stat(seg['odds_ratio'], '.3f')}, "
+        f"heterogeneity p = {format_stat(seg['heterogeneity_p'], '.3g')}</p>"
+        + _table(seg['strata'])
+        for dim, seg in report['segments'].items()
+    )
+    quality = report['quality']
+    srm = quality['srm']
+    bayes = report['bayesian']
+    adjusted = report['adjusted']
+    treatment, control = html.escape(m['treatment_arm']), html.escape(m['control_arm'])
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>A/B report: {name}</title><style>{_STYLE}</style></head>
+<body>
+<h1>A/B Testing Report: {name}</h1>
+<p>{report['rows']:,} users &middot; &alpha; = {report['alpha']} &middot; analysed in {report['timings']['total']:.2f}s</p>
+<div class="{box}"><strong>Recommendation: {decision['recommendation'].upper()}</strong> &mdash;
+lift {format_stat(m['lift'], '+.1f')}% ({html.escape(m['treatment_arm'])} {m['ad_rate'] * 100:.2f}% vs
+{html.escape(m['control_arm'])} {m['psa_rate'] * 100:.2f}%), p = {format_stat(m['p_value'], '.3g')}</div>
+
+<h2>Decision Framework</h2>
+<table><tr><th>Criterion</th><th>Threshold</th><th>Result</th><th>Status</th></tr>{criteria}</table>
+
+<h2>Data Quality</h2>
+<p>SRM &chi;&sup2; = {format_stat(srm['chi2'], '.2f')}, p = {format_stat(srm['p_value'], '.3g')}
+({'mismatch' if srm['mismatch'] else 'no mismatch'}{', equal shares assumed' if srm.get('equal_shares') else ''});
+duplicate ids: {quality.get('duplicate_ids', '-')}; missing values: {quality.get('null_total', '-')}</p>
+{_table(report['arms'])}
+
+<h2>Statistical Tests</h2>
+{_table({key: value for key, value in m.items()})}
+<h3>Arm comparisons</h3>
+{_table(report['arm_comparisons'])}
+<h3>Bayesian</h3>
+<p>P({treatment} &gt; {control}) = {format_stat(bayes['prob_ad_better'], '.4f')}; expected loss of shipping
+{treatment} = {format_stat(bayes['expected_loss_ad'] * 100, '.4f')}pp;
+relative lift {format_stat(bayes['relative_lift']['mean'], '.1f')}%
+[{format_stat(bayes['relative_lift']['ci'][0], '.1f')}%, {format_stat(bayes['relative_lift']['ci'][1], '.1f')}%]</p>
+<h3>Sequential (mSPRT)</h3>
+{_table(report['sequential'])}
+<h3>Covariate-adjusted lift</h3>
+<p>{format_stat(adjusted['lift'], '+.1f')}% [{format_stat(adjusted['lift_ci'][0], '.1f')}%,
+{format_stat(adjusted['lift_ci'][1], '.1f')}%];
+variance reduction {format_stat(adjusted['variance_reduction'], '.1%')}</p>
+
+<h2>Segments</h2>
+{segments}
+
+<h2>Dose-Response (ad group)</h2>
+<table><tr><th>Ads</th><th>Users</th><th>Conversion</th><th></th></tr>{dose}</table>
+</body></html>
+"""
+
+
+def _report_one(path, out_dir, name, options):
+    """Worker: analyse one file and write its JSON and HTML; never raises"""
+    start = time.perf_counter()
+    summary = {'name': name, 'path': os.path.abspath(path)}
+    try:
+        report = analyze(path, **options)
+        # Render first so a formatting error cannot leave an empty .html behind
+        page = render_html(report)
+        with open(os.path.join(out_dir, f'{name}.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        with open(os.path.join(out_dir, f'{name}.html'), 'w') as f:
+            f.write(page)
+        m = report['metrics']
+        summary.update(status='ok', rows=report['rows'], lift=m['lift'], p_value=m['p_value'],
+                       prob_ad_better=report['bayesian']['prob_ad_better'],
+                       recommendation=report['decision']['recommendation'])
+    except Exception as exc:
+        summary.update(status='error', error=f'{type(exc).__name__}: {exc}',
+                       traceback=traceback.format_exc(limit=5))
+    finally:
+        # Workers go through many files; keep only the one being analysed in memory
+        clear_cache()
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def report_names(paths):
+    """Report file names: the file stem, suffixed with a counter when stems repeat"""
+    names, seen = [], {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f'{stem}-{seen[stem]}')
+    return names
+
+
+def _index_html(summaries, seconds):
+    rows = ''.join(
+        f"<tr><td><a href=\"{html.escape(s['name'])}.html\">{html.escape(s['name'])}</a></td>"
+        f"<td>{s.get('rows', 0):,}</td><td>{format_stat(s['lift'], '+.1f')}%</td>"
+        f"<td>{format_stat(s['p_value'], '.3g')}</td><td>{format_stat(s['prob_ad_better'], '.4f')}</td>"
+        f"<td>{s['recommendation']}</td><td>{s['seconds']:.2f}s</td></tr>"
+        if s['status'] == 'ok' else
+        f"<tr><td>{html.escape(s['name'])}</td><td colspan=\"6\" class=\"fail\">{html.escape(s['error'])}</td></tr>"
+        for s in summaries
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>A/B reports</title><style>{_STYLE}</style></head>
+<body>
+<h1>A/B Testing Reports</h1>
+<p>{len(summaries)} experiments in {seconds:.1f}s</p>
+<table><tr><th>Experiment</th><th>Users</th><th>Lift</th><th>p-value</th><th>P(Ad &gt; PSA)</th>
+<th>Recommendation</th><th>Time</th></tr>{rows}</table>
+</body></html>
+"""
+
+
+def run_reports(spec, out_dir, workers=None, **options):
+    """Report on every CSV matched by ``spec`` across a process pool
+
+    ``spec`` is a directory, glob, file or list of these (see ``expand_shards``).
+    ``workers`` defaults to one per CPU (capped at the file count);
+    ``workers=1`` runs in-process. ``options`` go to ``analyze``. Returns the
+    per-file summaries also written to ``summary.json``.
+    """
+    paths = expand_shards(spec)
+    if not paths:
+        raise ValueError(f'No CSV files found for {spec!r}')
+    os.makedirs(out_dir, exist_ok=True)
+    names = report_names(paths)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+
+    start = time.perf_counter()
+    if workers == 1:
+        summaries = [_report_one(path, out_dir, name, options) for path, name in zip(paths, names)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(_report_one, paths, [out_dir] * len(paths), names,
+                                      [options] * len(paths)))
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+        json.dump(jsonable({'workers': workers, 'seconds': elapsed, 'reports': summaries}), f, indent=2)
+    with open(os.path.join(out_dir, 'index.html'), 'w') as f:
+        f.write(_index_html(summaries, elapsed))
+    return summaries
@@ -0,0 +1,96 @@
+"""
+Declared column schema for the experiment frame
+
+Strings are stored as categoricals and integers in the narrowest unsigned type
+that holds their valid range, which takes the 588k-row sample from ~30 MB as
+loaded by a default ``pd.read_csv`` on pandas 3 (~87 MB with object strings
+on pandas 2) to under 6 MB. Integer columns are parsed wide, range-checked,
+then narrowed, so an out-of-range value is rejected instead of silently
+wrapping around.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+# Bump when the declared layout changes so stale snapshots are rebuilt
+SCHEMA_VERSION = 2
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SCHEMA = {
+    'user id': 'uint32',
+    'test group': 'category',
+    'converted': 'bool',
+    'total ads': 'uint16',
+    'most ads day': pd.CategoricalDtype(DAYS),
+    'most ads hour': 'uint8',
+}
+
+# Inclusive bounds checked before integer columns are narrowed
+RANGES = {
+    'user id': (0, np.iinfo(np.uint32).max),
+    'total ads': (0, np.iinfo(np.uint16).max),
+    'most ads hour': (0, 23),
+}
+
+# What each column is read as; integers stay int64 until validated
+PARSE_DTYPES = {
+    column: ('int64' if column in RANGES else dtype) for column, dtype in SCHEMA.items()
+}
+
+
+def validate_frame(data):
+    """Raise ValueError if ``data`` has missing columns, nulls or out-of-range values"""
+    problems = []
+
+    missing = [column for column in SCHEMA if column not in data.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    nulls = data[list(SCHEMA)].isna().sum()
+    for column, count in nulls[nulls > 0].items():
+        # Unknown categories (e.g. a misspelled day) are read in as nulls
+        problems.append(f"'{column}' has {count:,} missing or unrecognised values")
+
+    for column, (low, high) in RANGES.items():
+        values = data[column].to_numpy()
+        bad = (values < low) | (values > high)
+        if bad.any():
+            problems.append(
+                f"'{column}' has {int(bad.sum()):,} values outside [{low}, {high}] "
+                f"(e.g. {values[bad][0]})"
+            )
+
+    if problems:
+        raise ValueError('Invalid experiment data: ' + '; '.join(problems))
+
+
+def apply_schema(data, validate=True):
+    """Validate ``data`` and cast it to the compact declared dtypes"""
+    if validate:
+        validate_frame(data)
+    return data.astype(SCHEMA)
+
+
+def memory_report(data, path=None):
+    """Compare deep memory usage of ``data`` against a default ``pd.read_csv`` load
+
+    The baseline is ``path`` parsed with no dtypes, or ``data`` round-tripped
+    through CSV text when no path is given, so it reflects whatever the
+    installed pandas infers (object or ``str`` strings, int64 integers).
+    """
+    source = path if path is not None else io.StringIO(data.to_csv())
+    default = pd.read_csv(source, index_col=0)
+
+    before = default.memory_usage(deep=True)
+    after = data.memory_usage(deep=True)
+    report = pd.DataFrame({
+        'default_dtype': default.dtypes.astype(str),
+        'compact_dtype': data.dtypes.astype(str),
+        'default_bytes': before,
+        'compact_bytes': after,
+    }, index=after.index)
+    report.loc['Total', ['default_bytes', 'compact_bytes']] = [before.sum(), after.sum()]
+    report['reduction'] = report['default_bytes'] / report['compact_bytes']
+    return report
@@ -0,0 +1,111 @@
+"""
+Sequential testing with always-valid p-values (mSPRT)
+
+A fixed-horizon z-test is only valid if it is looked at once. The mixture
+sequential probability ratio test (Johari et al., "Always Valid Inference")
+compares the normal likelihood of the observed difference in conversion
+rates under H0 against a N(0, tau^2) mixture of alternatives. Its p-value and
+confidence sequence stay valid however often the dashboard is refreshed, so
+a test can be stopped as soon as the evidence is there.
+
+Everything is computed from running per-arm counts, so each update is O(1).
+"""
+import numpy as np
+
+DEFAULT_TAU = 0.01
+
+
+def msprt(ad_conversions, ad_total, psa_conversions, psa_total, tau=DEFAULT_TAU, alpha=0.05):
+    """mSPRT statistics for the difference in conversion rates at one look
+
+    ``tau`` is the standard deviation of the mixing distribution over the
+    absolute difference; it should be on the scale of plausible effects.
+    The returned ``p_value`` (1 / likelihood ratio) is valid on its own; a
+    running minimum across looks (see ``SequentialTest``) is tighter.
+    """
+    ad_rate = ad_conversions / ad_total
+    psa_rate = psa_conversions / psa_total
+    diff = ad_rate - psa_rate
+
+    # Variance of the difference under H0, from the pooled rate
+    pooled = (ad_conversions + psa_conversions) / (ad_total + psa_total)
+    var = pooled * (1 - pooled) * (1 / ad_total + 1 / psa_total)
+    tau2 = tau ** 2
+
+    log_lr = 0.5 * np.log(var / (var + tau2)) + diff ** 2 * tau2 / (2 * var * (var + tau2))
+    p_value = float(min(1.0, np.exp(-log_lr)))
+
+    # Always-valid (1 - alpha) confidence sequence for the difference
+    var_diff = ad_rate * (1 - ad_rate) / ad_total + psa_rate * (1 - psa_rate) / psa_total
+    half_width = np.sqrt(
+        var_diff * (var_diff + tau2) / tau2 *
+        (2 * np.log(1 / alpha) + np.log((var_diff + tau2) / var_diff))
+    )
+
+    return {
+        'abs_diff': float(diff),
+        'log_likelihood_ratio': float(log_lr),
+        'p_value': p_value,
+        'cs_lower': float(diff - half_width),
+        'cs_upper': float(diff + half_width),
+        'reject': p_value <= alpha,
+    }
+
+
+class SequentialTest:
+    """Running mSPRT over batches of new observations
+
+    Feed either increments (``update``) or the latest cumulative totals
+    (``observe``); both cost O(1). ``p_value`` is the running minimum of the
+    per-look p-values and the confidence sequence is the running
+    intersection, as the always-valid guarantees require.
+    """
+
+    def __init__(self, alpha=0.05, tau=DEFAULT_TAU):
+        self.alpha = alpha
+        self.tau = tau
+        self.counts = np.zeros(4, dtype=np.int64)
+        self.looks = 0
+        self.p_value = 1.0
+        self.cs_lower = -np.inf
+        self.cs_upper = np.inf
+        self.stopped_at = None
+
+    def update(self, ad_conversions, ad_total, psa_conversions, psa_total):
+        """Add a batch of new counts and return the current state"""
+        self.counts += (ad_conversions, ad_total, psa_conversions, psa_total)
+        return self._look()
+
+    def observe(self, ad_conversions, ad_total, psa_conversions, psa_total):
+        """Replace the running totals with the latest cumulative counts"""
+        totals = np.array([ad_conversions, ad_total, psa_conversions, psa_total], dtype=np.int64)
+        if (totals < self.counts).any():
+            raise ValueError('Cumulative counts cannot decrease between looks')
+        self.counts = totals
+        return self._look()
+
+    def _look(self):
+        ad_conversions, ad_total, psa_conversions, psa_total = self.counts
+        if ad_total == 0 or psa_total == 0:
+            return self.state()
+
+        look = msprt(ad_conversions, ad_total, psa_conversions, psa_total,
+                     tau=self.tau, alpha=self.alpha)
+        self.looks += 1
+        self.p_value = min(self.p_value, look['p_value'])
+        self.cs_lower = max(self.cs_lower, look['cs_lower'])
+        self.cs_upper = min(self.cs_upper, look['cs_upper'])
+        if self.stopped_at is None and self.p_value <= self.alpha:
+            self.stopped_at = int(ad_total + psa_total)
+        return self.state()
+
+    def state(self):
+        return {
+            'looks': self.looks,
+            'users': int(self.counts[1] + self.counts[3]),
+            'p_value': self.p_value,
+            'cs_lower': self.cs_lower,
+            'cs_upper': self.cs_upper,
+            'reject': self.p_value <= self.alpha,
+            'stopped_at': self.stopped_at,
+        }
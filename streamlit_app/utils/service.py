@@ -0,0 +1,262 @@
+"""
+Read-only JSON service over precomputed experiment aggregates
+
+An asyncio HTTP/1.1 server (stdlib only) for tools that want the app's
+numbers without the Streamlit UI:
+
+    GET /experiments                              names and endpoint URLs
+    GET /experiments/<name>/metrics               metrics, arm comparisons, SRM
+    GET /experiments/<name>/segments/<dim>        dim is day, hour or exposure
+    GET /experiments/<name>/dose-response
+    GET /stats                                    cache and request counters
+
+The first request for an experiment builds its ``SegmentCube`` in a worker
+thread and serializes every endpoint's JSON once. Later requests write those
+bytes as they are. Concurrent requests for an experiment that is still being
+built await the same future, so each file version is aggregated once. Entries
+are revalidated against the file's mtime and size like ``data_store``.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urlsplit
+
+from calculations import calculate_metrics_from_cube
+from cube import ARM, DAY, EXPOSURE, HOUR, SegmentCube
+from data_store import load_frame
+from instrumentation import is_enabled, record, span
+from multiarm import compare_arms
+from parallel import expand_shards
+from quality import EXPECTED_ALLOCATION, srm_test
+from reporting import dose_response, jsonable, report_names, segment_breakdown
+from streaming import stream_cube
+
+DEFAULT_PORT = 8765
+
+# URL names of the segment dimensions
+SEGMENT_DIMS = {'day': DAY, 'hour': HOUR, 'exposure': EXPOSURE}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+def endpoints(name):
+    """Paths served for experiment ``name``"""
+    base = f'/experiments/{quote(name)}'
+    return ([f'{base}/metrics'] + [f'{base}/segments/{dim}' for dim in SEGMENT_DIMS]
+            + [f'{base}/dose-response'])
+
+
+def build_payloads(path, alpha=0.05, stream=False, allocation=EXPECTED_ALLOCATION):
+    """Aggregate the experiment at ``path`` and serialize every endpoint's JSON
+
+    Returns ``{'metrics': bytes, 'segments/day': bytes, ..., 'dose-response': bytes}``.
+    Only the cube is built from rows; the row-level frame is not kept.
+    """
+    if stream:
+        cube, _ = stream_cube(path)
+    else:
+        cube = SegmentCube.from_frame(load_frame(path))
+    counts = cube.arm_counts()
+    metrics = calculate_metrics_from_cube(cube, alpha=alpha)
+    treatment, control = metrics['treatment_arm'], metrics['control_arm']
+    dose = dose_response(cube, treatment)
+    payloads = {
+        'metrics': {
+            'rows': cube.total_users,
+            'alpha': alpha,
+            'arms': cube.summary(ARM),
+            'metrics': metrics,
+            'arm_comparisons': compare_arms(counts, control=control, alpha=alpha),
+            'srm': srm_test(counts['trials'], allocation),
+        },
+        'dose-response': {
+            'dose_response': dose,
+            'optimal_dose': str(dose['Conversion_Rate'].idxmax()) if len(dose) else None,
+        },
+    }
+    for key, dim in SEGMENT_DIMS.items():
+        payloads[f'segments/{key}'] = segment_breakdown(cube, dim, alpha, treatment, control)
+    return {key: json.dumps(jsonable(value)).encode() for key, value in payloads.items()}
+
+
+class AggregateCache:
+    """Serialized payloads per experiment, built at most once per file version
+
+    Must be used from a single event loop. Builds run on ``executor``.
+    """
+
+    def __init__(self, paths, executor, **options):
+        self.paths = dict(paths)
+        self._executor = executor
+        self._options = options
+        self._entries = {}
+        self._pending = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'builds': 0, 'build_errors': 0,
+                      'build_time': 0.0}
+
+    def is_cached(self, name):
+        entry = self._entries.get(name)
+        return entry is not None and entry[1].exception() is None
+
+    def _build(self, path):
+        start = time.perf_counter()
+        with span('service.build'):
+            payloads = build_payloads(path, **self._options)
+        return payloads, time.perf_counter() - start
+
+    def _finish(self, name, signature, future):
+        # Runs once per build however many requests await it, even if they all went away
+        if self._pending.get(name, (None, None))[1] is future:
+            del self._pending[name]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.stats['build_errors'] += 1
+        else:
+            self.stats['builds'] += 1
+            self.stats['build_time'] += future.result()[1]
+        # Failures are kept too: a broken file stays broken until it changes
+        self._entries[name] = (signature, future)
+
+    async def get(self, name):
+        """Payloads of experiment ``name`` (``KeyError`` if unknown)"""
+        path = self.paths[name]
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == signature:
+            self.stats['hits'] += 1
+            return entry[1].result()[0]
+
+        pending = self._pending.get(name)
+        if pending is not None and pending[0] == signature:
+            self.stats['coalesced'] += 1
+            future = pending[1]
+        else:
+            self.stats['misses'] += 1
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._build, path)
+            self._pending[name] = (signature, future)
+            future.add_done_callback(lambda done: self._finish(name, signature, done))
+        # A disconnecting client must not cancel the build other requests are waiting on
+        payloads, _ = await asyncio.shield(future)
+        return payloads
+
+    async def warm(self):
+        """Build every experiment (concurrently, bounded by the executor)"""
+        results = await asyncio.gather(*(self.get(name) for name in self.paths), return_exceptions=True)
+        return {name: result for name, result in zip(self.paths, results) if isinstance(result, Exception)}
+
+
+def _json(status, value):
+    return status, json.dumps(jsonable(value)).encode()
+
+
+class MetricsService:
+    """Routes requests onto an ``AggregateCache`` and speaks minimal HTTP/1.1 with keep-alive"""
+
+    def __init__(self, spec, workers=None, **options):
+        paths = expand_shards(spec)
+        if not paths:
+            raise ValueError(f'No CSV files found for {spec!r}')
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                            thread_name_prefix='ab-service')
+        self.cache = AggregateCache(zip(report_names(paths), paths), self._executor, **options)
+        self.requests = {'total': 0, 'errors': 0}
+        self.started = time.time()
+
+    def _stats(self):
+        cache = dict(self.cache.stats, entries=sum(map(self.cache.is_cached, self.cache.paths)))
+        return {'uptime': time.time() - self.started, 'requests': self.requests, 'cache': cache}
+
+    async def dispatch(self, method, target):
+        """``(status, body)`` for one request"""
+        if method not in ('GET', 'HEAD'):
+            return _json(405, {'error': f'{method} not allowed'})
+        parts = [unquote(part) for part in urlsplit(target).path.split('/') if part]
+        if parts in ([], ['experiments']):
+            return _json(200, [{'name': name, 'path': path, 'cached': self.cache.is_cached(name),
+                                'endpoints': endpoints(name)}
+                               for name, path in self.cache.paths.items()])
+        if parts == ['stats']:
+            return _json(200, self._stats())
+        if parts == ['healthz']:
+            return _json(200, {'status': 'ok'})
+        if len(parts) < 3 or parts[0] != 'experiments':
+            return _json(404, {'error': f'Unknown path {target}'})
+
+        name, key = parts[1], '/'.join(parts[2:])
+        if name not in self.cache.paths:
+            return _json(404, {'error': f'Unknown experiment {name!r}'})
+        try:
+            payloads = await self.cache.get(name)
+        except Exception as exc:
+            return _json(500, {'error': f'{type(exc).__name__}: {exc}'})
+        if key not in payloads:
+            return _json(404, {'error': f'Unknown endpoint {key!r}', 'endpoints': endpoints(name)})
+        return 200, payloads[key]
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    field, _, value = line.decode('latin-1').partition(':')
+                    headers[field.strip().lower()] = value.strip().lower()
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    method, target, version = None, '', 'HTTP/1.0'
+                    status, body = _json(400, {'error': 'Malformed request line'})
+                else:
+                    status, body = await self.dispatch(method, target)
+
+                connection = headers.get('connection', '')
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                head = (f'HTTP/1.1 {status} {_REASONS[status]}\r\n'
+                        'Content-Type: application/json\r\n'
+                        f'Content-Length: {len(body)}\r\n'
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode()
+                writer.write(head if method == 'HEAD' else head + body)
+                await writer.drain()
+
+                self.requests['total'] += 1
+                if status >= 400:
+                    self.requests['errors'] += 1
+                if is_enabled():
+                    record('service.request', time.perf_counter() - start, page='service')
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Dropped connections and oversized or garbled requests just end the connection
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, warm=False, ready=None):
+        """Listen until cancelled; ``ready`` is called with the bound (host, port)"""
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            if warm:
+                for name, exc in (await self.cache.warm()).items():
+                    print(f'{name}: {type(exc).__name__}: {exc}')
+            if ready is not None:
+                ready(server.sockets[0].getsockname()[:2])
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,110 @@
+"""
+Columnar binary snapshots of the experiment CSV
+
+A snapshot is a directory next to the source file (``marketing_AB.snapshot``)
+holding one ``.npy`` file per column plus ``meta.json``. Categorical columns
+are stored as integer codes with their categories in the metadata, so a load
+is a handful of contiguous array reads instead of a CSV parse. The metadata
+records the content hash of the source, and a snapshot is only used while
+that hash still matches.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+INDEX_FILE = '__index__.npy'
+
+
+def snapshot_dir(source_path):
+    """Return the snapshot directory that belongs to ``source_path``"""
+    root, _ = os.path.splitext(os.path.abspath(source_path))
+    return root + '.snapshot'
+
+
+def _column_file(position):
+    return f'col{position:02d}.npy'
+
+
+def write_snapshot(frame, directory, source_digest):
+    """Write ``frame`` as a columnar snapshot tagged with ``source_digest``"""
+    tmp_dir = f'{directory}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for position, name in enumerate(frame.columns):
+        series = frame[name]
+        spec = {'name': name, 'file': _column_file(position)}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            spec['dtype'] = 'category'
+            spec['categories'] = [str(c) for c in series.cat.categories]
+            spec['ordered'] = bool(series.cat.ordered)
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+            spec['dtype'] = str(values.dtype)
+        np.save(os.path.join(tmp_dir, spec['file']), values, allow_pickle=False)
+        columns.append(spec)
+
+    if isinstance(frame.index, pd.RangeIndex):
+        index_spec = {'range': [frame.index.start, frame.index.stop, frame.index.step]}
+    else:
+        index_spec = {'file': INDEX_FILE}
+        np.save(os.path.join(tmp_dir, INDEX_FILE), frame.index.to_numpy(), allow_pickle=False)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'source_digest': source_digest,
+        'rows': len(frame),
+        'index_name': frame.index.name,
+        'index': index_spec,
+        'columns': columns,
+    }
+    # meta.json is written last so a half-written snapshot is never picked up
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(tmp_dir, directory)
+
+
+def read_snapshot(directory, source_digest=None):
+    """Load a snapshot, or return None if it is missing, stale or unreadable"""
+    meta_path = os.path.join(directory, META_FILE)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('format_version') != FORMAT_VERSION:
+        return None
+    if source_digest is not None and meta.get('source_digest') != source_digest:
+        return None
+
+    try:
+        data = {}
+        for spec in meta['columns']:
+            values = np.load(os.path.join(directory, spec['file']), allow_pickle=False)
+            if spec['dtype'] == 'category':
+                dtype = pd.CategoricalDtype(spec['categories'], ordered=spec['ordered'])
+                data[spec['name']] = pd.Categorical.from_codes(values, dtype=dtype)
+            else:
+                data[spec['name']] = values
+        index_spec = meta['index']
+        if 'range' in index_spec:
+            index = pd.RangeIndex(*index_spec['range'], name=meta['index_name'])
+        else:
+            values = np.load(os.path.join(directory, index_spec['file']), allow_pickle=False)
+            index = pd.Index(values, name=meta['index_name'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return pd.DataFrame(data, index=index)
@@ -0,0 +1,123 @@
+"""
+Stratified analysis (Cochran-Mantel-Haenszel) over cube dimensions
+
+Summing the cube over every axis except one gives a 2x2xK tensor of
+converted / not-converted counts per arm and stratum. The CMH test, the
+Mantel-Haenszel pooled odds ratio and risk difference, per-stratum lifts and
+Woolf's test for a common odds ratio are vectorized reductions over that
+tensor, so no per-stratum filtering of rows is needed.
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from cube import DIMS
+from multiarm import TREATMENT_ARM, CONTROL_ARM
+
+
+def stratum_tables(cube, dim, treatment=TREATMENT_ARM, control=CONTROL_ARM):
+    """(2, 2, K) counts [arm][converted, not converted][stratum] plus stratum labels
+
+    Strata missing either arm are dropped since they carry no comparison.
+    """
+    axis = DIMS.index(dim)
+    others = tuple(i for i in range(1, len(DIMS)) if i != axis)
+    arms = [cube.arms.index(treatment), cube.arms.index(control)]
+    users = cube.users[arms].sum(axis=others)
+    conversions = cube.conversions[arms].sum(axis=others)
+
+    keep = (users > 0).all(axis=0)
+    labels = [label for label, k in zip(cube._levels(dim), keep) if k]
+    tables = np.stack([conversions, users - conversions], axis=1)[:, :, keep].astype(np.float64)
+    return tables, labels
+
+
+def cmh_test(tables, correction=True):
+    """CMH chi-square for conditional independence of arm and conversion (1 df)"""
+    a = tables[0, 0]
+    n1, n0 = tables[0].sum(axis=0), tables[1].sum(axis=0)
+    m1, m0 = tables[:, 0].sum(axis=0), tables[:, 1].sum(axis=0)
+    total = n1 + n0
+
+    expected = n1 * m1 / total
+    variance = n1 * n0 * m1 * m0 / (total ** 2 * (total - 1))
+    deviation = np.abs(a.sum() - expected.sum())
+    if correction:
+        deviation = max(deviation - 0.5, 0.0)
+    statistic = deviation ** 2 / variance.sum()
+    return float(statistic), float(stats.chi2.sf(statistic, 1))
+
+
+def mantel_haenszel(tables, alpha=0.05):
+    """Pooled odds ratio (Robins-Breslow-Greenland CI) and risk difference"""
+    a, b = tables[0]
+    c, d = tables[1]
+    n1, n0 = a + b, c + d
+    total = n1 + n0
+
+    r, s = a * d / total, b * c / total
+    p, q = (a + d) / total, (b + c) / total
+    odds_ratio = r.sum() / s.sum()
+    var_log_or = ((p * r).sum() / (2 * r.sum() ** 2)
+                  + ((p * s) + (q * r)).sum() / (2 * r.sum() * s.sum())
+                  + (q * s).sum() / (2 * s.sum() ** 2))
+
+    risk_diff = (a * n0 / total - c * n1 / total).sum() / (n1 * n0 / total).sum()
+
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    half = z_crit * np.sqrt(var_log_or)
+    return {
+        'odds_ratio': float(odds_ratio),
+        'odds_ratio_ci': (float(odds_ratio * np.exp(-half)), float(odds_ratio * np.exp(half))),
+        'risk_diff': float(risk_diff),
+    }
+
+
+def woolf_test(tables):
+    """Woolf's chi-square test that every stratum shares one odds ratio (K - 1 df)"""
+    cells = tables.reshape(4, -1)
+    # Haldane correction only for strata with an empty cell
+    cells = cells + 0.5 * (cells == 0).any(axis=0)
+    a, b, c, d = cells
+    log_or = np.log(a * d / (b * c))
+    weight = 1 / (1 / a + 1 / b + 1 / c + 1 / d)
+    pooled = (weight * log_or).sum() / weight.sum()
+    statistic = (weight * (log_or - pooled) ** 2).sum()
+    dof = len(log_or) - 1
+    return float(statistic), float(stats.chi2.sf(statistic, dof)) if dof > 0 else 1.0, dof
+
+
+def stratified_analysis(cube, dim, treatment=TREATMENT_ARM, control=CONTROL_ARM, alpha=0.05):
+    """CMH test, pooled effects, heterogeneity test and per-stratum lifts across ``dim``"""
+    tables, labels = stratum_tables(cube, dim, treatment, control)
+    users = tables.sum(axis=1)
+    rates = tables[:, 0] / users
+    diff = rates[0] - rates[1]
+    se = np.sqrt((rates * (1 - rates) / users).sum(axis=0))
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = diff / rates[1] * 100
+
+    strata = pd.DataFrame({
+        'treatment_users': users[0].astype(np.int64),
+        'control_users': users[1].astype(np.int64),
+        'treatment_rate': rates[0],
+        'control_rate': rates[1],
+        'abs_diff': diff,
+        'lift': lift,
+        'ci_lower': diff - z_crit * se,
+        'ci_upper': diff + z_crit * se,
+    }, index=pd.Index(labels, name=dim))
+
+    cmh, cmh_p = cmh_test(tables)
+    woolf, woolf_p, dof = woolf_test(tables)
+    return {
+        'dimension': dim,
+        'strata': strata,
+        'cmh': cmh,
+        'cmh_p': cmh_p,
+        **mantel_haenszel(tables, alpha),
+        'heterogeneity': woolf,
+        'heterogeneity_p': woolf_p,
+        'heterogeneity_dof': dof,
+    }
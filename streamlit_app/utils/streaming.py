@@ -0,0 +1,78 @@
+"""
+Chunked ingestion for experiment logs larger than memory
+
+The CSV is read in batches sized to stay under a memory ceiling. Each batch
+is validated against the schema and folded into a ``SegmentCube``, which
+holds everything ``calculate_metrics`` and the Analysis charts need. Only one
+batch plus the (few-kilobyte) cube is ever resident.
+"""
+import time
+
+import pandas as pd
+
+from cube import SegmentCube
+from schema import PARSE_DTYPES, apply_schema
+
+DEFAULT_MEMORY_LIMIT_MB = 64
+
+# Parsing holds the raw text buffer and wide integer columns next to the
+# typed chunk, so the resident cost per row is a multiple of the typed size
+PARSE_OVERHEAD = 8
+INITIAL_BYTES_PER_ROW = 256
+
+
+def _rows_for(limit_bytes, bytes_per_row):
+    return max(1_000, int(limit_bytes // (bytes_per_row * PARSE_OVERHEAD)))
+
+
+def stream_cube(path, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, chunk_rows=None,
+                progress=None):
+    """Aggregate the CSV at ``path`` chunk by chunk
+
+    ``chunk_rows`` fixes the batch size; otherwise it is derived from
+    ``memory_limit_mb`` and re-estimated from each parsed chunk. ``progress``
+    is called with the running stats after every chunk.
+
+    Returns ``(cube, stats)`` where stats reports rows, chunks, elapsed
+    seconds, rows/sec and the largest chunk held in memory.
+    """
+    limit_bytes = memory_limit_mb * 1024 ** 2
+    rows = chunk_rows or _rows_for(limit_bytes, INITIAL_BYTES_PER_ROW)
+
+    cube = None
+    stats = {
+        'rows': 0,
+        'chunks': 0,
+        'seconds': 0.0,
+        'rows_per_sec': 0.0,
+        'peak_chunk_mb': 0.0,
+        'memory_limit_mb': memory_limit_mb,
+    }
+    start = time.perf_counter()
+
+    with pd.read_csv(path, index_col=0, dtype=PARSE_DTYPES, iterator=True) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(rows)
+            except StopIteration:
+                break
+
+            chunk_bytes = chunk.memory_usage(deep=True).sum()
+            part = SegmentCube.from_frame(apply_schema(chunk))
+            cube = part if cube is None else cube.merge(part)
+
+            stats['rows'] += len(chunk)
+            stats['chunks'] += 1
+            stats['peak_chunk_mb'] = max(stats['peak_chunk_mb'], float(chunk_bytes) / 1024 ** 2)
+            stats['seconds'] = time.perf_counter() - start
+            stats['rows_per_sec'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress is not None:
+                progress(dict(stats))
+
+            if chunk_rows is None and len(chunk):
+                rows = _rows_for(limit_bytes, chunk_bytes / len(chunk))
+
+    if cube is None:
+        raise ValueError(f'No rows found in {path}')
+    stats['chunk_rows'] = rows
+    return cube, stats
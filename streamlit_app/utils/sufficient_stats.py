@@ -0,0 +1,52 @@
+"""
+Sufficient statistics for conversion experiments
+
+Every test in ``calculate_metrics`` depends only on per-arm successes and
+trials. ``aggregate_counts`` produces those counts in a single pass using
+integer group codes and ``np.bincount``, so the statistics themselves never
+touch row-level data.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _codes(series):
+    """Return (integer codes, labels) for a column, reusing categorical codes when present"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, labels = pd.factorize(series, sort=True)
+    return codes, labels
+
+
+def aggregate_counts(data, by=None, group_col='test group', outcome_col='converted'):
+    """Count successes and trials per arm, optionally per segment column(s)
+
+    Returns a DataFrame indexed by arm (or arm + segment levels) with integer
+    ``successes`` and ``trials`` columns. Empty combinations are dropped.
+    """
+    by = [] if by is None else ([by] if isinstance(by, str) else list(by))
+    columns = [group_col] + by
+
+    # Mixed-radix flat key over all grouping columns
+    flat = np.zeros(len(data), dtype=np.int64)
+    valid = np.ones(len(data), dtype=bool)
+    levels = []
+    for column in columns:
+        codes, labels = _codes(data[column])
+        flat = flat * len(labels) + codes
+        valid &= codes >= 0
+        levels.append(labels)
+
+    # Rows with a missing key are dropped, as groupby does
+    size = int(np.prod([len(labels) for labels in levels]))
+    converted = data[outcome_col].to_numpy(dtype=bool)
+    flat = flat[valid]
+    trials = np.bincount(flat, minlength=size)
+    successes = np.bincount(flat[converted[valid]], minlength=size)
+
+    index = pd.MultiIndex.from_product(levels, names=columns)
+    counts = pd.DataFrame({'successes': successes, 'trials': trials}, index=index)
+    counts = counts[counts['trials'] > 0]
+    if not by:
+        counts.index = counts.index.get_level_values(0)
+    return counts
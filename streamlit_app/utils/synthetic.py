@@ -0,0 +1,130 @@
+"""
+Seeded synthetic experiment data for scale testing
+
+Generates frames with the ``marketing_AB.csv`` schema at any row count. Each
+chunk is drawn with whole-array NumPy calls from its own generator, seeded
+with ``(seed, chunk number)``. Chunks are therefore reproducible and
+independent, and output of any size is written one chunk at a time:
+
+- ``write_csv`` appends chunks to a single CSV;
+- ``write_shards`` writes one CSV per chunk plus its columnar snapshot, which
+  ``get_dataset`` picks up directly and ``aggregate_shards`` can fan out over.
+
+The model behind the data:
+
+- arms are drawn with the ``allocation`` shares;
+- ``total ads`` is a rounded-up log-normal (right-skewed, like the sample);
+- the chance of converting grows with ads seen as ``(ads / median) ** elasticity``,
+  scaled so the control arm converts at about ``base_rate`` overall;
+- every non-control arm converts ``1 + lift`` times as often as control at the
+  same exposure, so ``lift`` is the true relative lift;
+- day and hour are uniform.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import file_digest, snapshot_tag
+from multiarm import CONTROL_ARM
+from quality import EXPECTED_ALLOCATION
+from schema import DAYS, RANGES
+from snapshot import snapshot_dir, write_snapshot
+
+# Conversion rate of the control arm and relative lift of the others, as in the sample
+BASE_RATE = 0.018
+LIFT = 0.43
+
+# Log-normal ``total ads``: the sample has median 13 and mean ~25
+ADS_MEDIAN = 13
+ADS_SIGMA = 1.1
+ADS_ELASTICITY = 0.5
+
+# Ids are sequential from here, so they stay unique across chunks and shards
+FIRST_USER_ID = 900_000
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def generate_chunk(rows, chunk=0, seed=0, start=0, allocation=EXPECTED_ALLOCATION, control=CONTROL_ARM,
+                   base_rate=BASE_RATE, lift=LIFT, ads_median=ADS_MEDIAN, ads_sigma=ADS_SIGMA,
+                   ads_elasticity=ADS_ELASTICITY):
+    """``rows`` synthetic users indexed from ``start``, drawn from the generator for ``(seed, chunk)``"""
+    if control not in allocation:
+        raise ValueError(f'Control arm {control!r} is not in the allocation {sorted(allocation)}')
+    rng = np.random.default_rng([seed, chunk])
+    arms = sorted(allocation)
+    shares = np.array([allocation[arm] for arm in arms], dtype=np.float64)
+
+    arm_codes = rng.choice(len(arms), size=rows, p=shares / shares.sum()).astype(np.int8)
+    ads = np.ceil(rng.lognormal(np.log(ads_median), ads_sigma, rows))
+    ads = np.clip(ads, 1, RANGES['total ads'][1])
+
+    # E[(ads / median) ** e] = exp((e * sigma) ** 2 / 2) for the continuous log-normal
+    rate = base_rate * np.exp(ads_elasticity * (np.log(ads) - np.log(ads_median))
+                              - (ads_elasticity * ads_sigma) ** 2 / 2)
+    rate[arm_codes != arms.index(control)] *= 1 + lift
+    converted = rng.random(rows) < np.minimum(rate, 1.0)
+
+    return pd.DataFrame({
+        'user id': (FIRST_USER_ID + start + np.arange(rows)).astype(np.uint32),
+        'test group': pd.Categorical.from_codes(arm_codes, categories=arms),
+        'converted': converted,
+        'total ads': ads.astype(np.uint16),
+        'most ads day': pd.Categorical.from_codes(rng.integers(0, len(DAYS), rows, dtype=np.int8),
+                                                  dtype=pd.CategoricalDtype(DAYS)),
+        'most ads hour': rng.integers(0, 24, rows, dtype=np.uint8),
+    }, index=pd.RangeIndex(start, start + rows))
+
+
+def iter_chunks(rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, **params):
+    """Yield ``rows`` users as consecutive frames of at most ``chunk_rows``"""
+    if rows + FIRST_USER_ID > RANGES['user id'][1]:
+        raise ValueError(f'{rows:,} rows would overflow the uint32 user id')
+    for chunk, start in enumerate(range(0, rows, chunk_rows)):
+        yield generate_chunk(min(chunk_rows, rows - start), chunk, seed, start, **params)
+
+
+def _stats(rows, chunks, started, paths):
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'chunks': chunks,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'bytes': sum(os.path.getsize(path) for path in paths),
+        'paths': paths,
+    }
+
+
+def write_csv(path, rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, **params):
+    """Stream ``rows`` synthetic users into one CSV, holding a single chunk at a time"""
+    start = time.perf_counter()
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    chunks = 0
+    with open(tmp_path, 'w', newline='') as f:
+        for frame in iter_chunks(rows, chunk_rows, seed, **params):
+            frame.to_csv(f, header=chunks == 0)
+            chunks += 1
+    os.replace(tmp_path, path)
+    return _stats(rows, chunks, start, [path])
+
+
+def write_shards(directory, rows, shard_rows=DEFAULT_CHUNK_ROWS, seed=0, snapshots=True, **params):
+    """Write ``rows`` synthetic users as ``part-NNNNN.csv`` shards, each with its columnar snapshot
+
+    With the same ``seed``, ``shard_rows`` equal to ``chunk_rows`` and the same
+    parameters, the shards hold exactly the rows ``write_csv`` writes.
+    """
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for frame in iter_chunks(rows, shard_rows, seed, **params):
+        path = os.path.join(directory, f'part-{len(paths):05d}.csv')
+        frame.to_csv(path)
+        if snapshots:
+            # Tagged exactly as data_store would tag it, so loading the shard skips the parse
+            write_snapshot(frame, snapshot_dir(path), snapshot_tag(file_digest(path)))
+        paths.append(path)
+    return _stats(rows, len(paths), start, paths)